@@ -12,9 +12,32 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 SHORT_MEMORY_SIZE = int(os.getenv("SHORT_MEMORY_SIZE", "25"))
 LONG_MEMORY_SIZE = int(os.getenv("LONG_MEMORY_SIZE", "100"))
 MEMORY_DIR = os.getenv("MEMORY_DIR", "user_memories")
+# Seconds to collect new messages before writing them to disk together
+MEMORY_FLUSH_INTERVAL = float(os.getenv("MEMORY_FLUSH_INTERVAL", "1.0"))
 
 # Web search settings
 MAX_SEARCH_RESULTS = int(os.getenv("MAX_SEARCH_RESULTS", "100"))
+# Maximum number of DuckDuckGo searches running at the same time
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "5"))
+# Seconds to wait for searches before answering with whatever has finished
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "8"))
+# Character budgets for the search context sent to Gemini (per search and in total)
+SEARCH_RESULT_MAX_CHARS = int(os.getenv("SEARCH_RESULT_MAX_CHARS", "1500"))
+SEARCH_CONTEXT_MAX_CHARS = int(os.getenv("SEARCH_CONTEXT_MAX_CHARS", "8000"))
+# Characters of each recent message included when generating search queries
+SEARCH_HISTORY_MAX_CHARS = int(os.getenv("SEARCH_HISTORY_MAX_CHARS", "400"))
+# Recent search results are reused for identical or similar queries for this many seconds
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "300"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+# Minimum cosine similarity between query embeddings to reuse cached results
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+# After answering, search ahead for the user's likely next question to warm the cache.
+# Off by default: each reply then costs one extra Gemini call to predict the questions,
+# plus up to PREFETCH_MAX_QUERIES DuckDuckGo searches and query embeddings
+ENABLE_PREFETCH = os.getenv("ENABLE_PREFETCH", "false").lower() == "true"
+PREFETCH_MAX_QUERIES = int(os.getenv("PREFETCH_MAX_QUERIES", "2"))
+# Prefetching is low priority, so only one runs at a time by default
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "1"))
 
 # Proxy settings - DISABLED
 # Proxy system has been removed due to connection issues with DuckDuckGo
@@ -25,16 +48,43 @@ PROXY_FILE = ""
 # Maximum number of retries for DuckDuckGo searches
 MAX_SEARCH_RETRIES = int(os.getenv("MAX_SEARCH_RETRIES", "10"))
 
+# Language detection settings
+# Messages at least this long are classified locally with langdetect first;
+# Gemini is only asked when the local result is below the confidence threshold
+FAST_LANGUAGE_DETECTION_MIN_CHARS = int(os.getenv("FAST_LANGUAGE_DETECTION_MIN_CHARS", "20"))
+FAST_LANGUAGE_DETECTION_MIN_CONFIDENCE = float(os.getenv("FAST_LANGUAGE_DETECTION_MIN_CONFIDENCE", "0.9"))
+
 # Time awareness settings
 DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "Europe/Istanbul")
 TIME_AWARENESS_ENABLED = os.getenv("TIME_AWARENESS_ENABLED", "true").lower() == "true"
 # Only show time information when relevant to the conversation
 SHOW_TIME_ONLY_WHEN_RELEVANT = os.getenv("SHOW_TIME_ONLY_WHEN_RELEVANT", "true").lower() == "true"
+# Last message times are kept for this many users, and forgotten after this many days
+LAST_MESSAGE_CACHE_SIZE = int(os.getenv("LAST_MESSAGE_CACHE_SIZE", "100000"))
+LAST_MESSAGE_TTL_DAYS = int(os.getenv("LAST_MESSAGE_TTL_DAYS", "30"))
 
 # Website link settings
 # Only show website links when explicitly requested or relevant
 SHOW_LINKS_ONLY_WHEN_RELEVANT = os.getenv("SHOW_LINKS_ONLY_WHEN_RELEVANT", "true").lower() == "true"
 
+# Telegram settings
+# Maximum characters per outgoing Telegram message (Telegram's limit is 4096)
+TELEGRAM_MAX_MESSAGE_CHARS = int(os.getenv("TELEGRAM_MAX_MESSAGE_CHARS", "4096"))
+# Show responses while they are generated by editing the sent message. Streamed
+# responses are not shared between identical concurrent requests like the others are
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true"
+# Edit the streamed message after this many new characters or seconds, whichever comes first
+STREAM_EDIT_CHARS = int(os.getenv("STREAM_EDIT_CHARS", "400"))
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "0.5"))
+
+# Media analysis settings
+# Number of keyframes sent to Gemini instead of the whole video (needs PyAV)
+VIDEO_MAX_FRAMES = int(os.getenv("VIDEO_MAX_FRAMES", "4"))
+# Number of recent image/video analyses kept for re-sent or forwarded media
+MEDIA_CACHE_SIZE = int(os.getenv("MEDIA_CACHE_SIZE", "256"))
+# Maximum perceptual hash distance (in bits) for two images to count as the same
+MEDIA_CACHE_MAX_DISTANCE = int(os.getenv("MEDIA_CACHE_MAX_DISTANCE", "4"))
+
 # Gemini model settings
 GEMINI_MODEL = "gemini-2.5-flash-preview-04-17"
 GEMINI_TEMPERATURE = 0.7
@@ -42,6 +92,15 @@ GEMINI_TOP_P = 0.95
 GEMINI_TOP_K = 40
 GEMINI_MAX_OUTPUT_TOKENS = 1024
 
+# Gemini context caching
+# Cache the system prompt and older messages of a chat on the Gemini side so they
+# are billed at the cached-token rate; only used once they reach CONTEXT_CACHE_MIN_TOKENS
+CONTEXT_CACHE_ENABLED = os.getenv("CONTEXT_CACHE_ENABLED", "true").lower() == "true"
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "2048"))
+CONTEXT_CACHE_TTL = int(os.getenv("CONTEXT_CACHE_TTL", "300"))
+# Rebuild a chat's cache once this many older messages are missing from it
+CONTEXT_CACHE_REBUILD_MESSAGES = int(os.getenv("CONTEXT_CACHE_REBUILD_MESSAGES", "10"))
+
 # Specialized Gemini models
 # Model for web search, language detection, and media analysis
 GEMINI_FLASH_LITE_MODEL = "gemini-2.0-flash-lite"
@@ -50,6 +109,9 @@ GEMINI_FLASH_LITE_TOP_P = 0.95
 GEMINI_FLASH_LITE_TOP_K = 32
 GEMINI_FLASH_LITE_MAX_OUTPUT_TOKENS = 1024
 
+# Embedding model for the semantic search cache
+EMBEDDING_MODEL = "models/text-embedding-004"
+
 # Safety settings - all set to BLOCK_NONE as requested
 SAFETY_SETTINGS = [
     {
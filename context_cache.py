@@ -0,0 +1,129 @@
+import asyncio
+import datetime
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import google.generativeai as genai
+from google.generativeai import caching
+
+import config
+from personality import format_history_for_gemini
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Gemini context caches by chat_id. Each entry holds the CachedContent, the model
+# built from it, the system prompt and last message it covers, and its local expiry time.
+chat_caches: Dict[int, Dict[str, Any]] = {}
+
+# Background tasks (re)building a chat's cache, by chat_id
+_building: Dict[int, asyncio.Task] = {}
+
+def _find_uncovered(prefix_messages: List[Dict[str, str]], last_cached: Dict[str, str]) -> Optional[List[Dict[str, str]]]:
+    """
+    Get the prefix messages added after the last message stored in a cache
+
+    Args:
+        prefix_messages: The chat's current cacheable prefix
+        last_cached: The last message stored in the cache
+
+    Returns:
+        Messages after last_cached, or None if it is no longer part of the prefix
+    """
+    # Memory hands out the same message dicts, so identity tells us where the cache ends
+    for i in range(len(prefix_messages) - 1, -1, -1):
+        if prefix_messages[i] is last_cached:
+            return prefix_messages[i + 1:]
+    return None
+
+def _build_cache(chat_id: int, system_prompt: str, prefix_messages: List[Dict[str, str]], generation_config: Dict[str, Any]) -> None:
+    """
+    Create a Gemini context cache for a chat's system prompt and older messages
+
+    Args:
+        chat_id: The Telegram chat ID
+        system_prompt: The system prompt with Puro's personality
+        prefix_messages: The chat's older messages
+        generation_config: Generation settings for the cached model
+    """
+    try:
+        # Same role prefixes as the live part of the prompt (format_messages_for_gemini)
+        history = f"Earlier conversation:\n{format_history_for_gemini(prefix_messages)}"
+
+        # Gemini rejects caches below a minimum size, roughly 4 characters per token
+        estimated_tokens = (len(system_prompt) + len(history)) // 4
+        if estimated_tokens < config.CONTEXT_CACHE_MIN_TOKENS:
+            logger.debug(f"Skipping context cache for chat {chat_id}, only ~{estimated_tokens} tokens")
+            return
+
+        cached_content = caching.CachedContent.create(
+            model=config.GEMINI_MODEL,
+            system_instruction=system_prompt,
+            contents=[history],
+            ttl=datetime.timedelta(seconds=config.CONTEXT_CACHE_TTL),
+        )
+        model = genai.GenerativeModel.from_cached_content(
+            cached_content,
+            generation_config=generation_config,
+            safety_settings=config.SAFETY_SETTINGS
+        )
+
+        old_entry = chat_caches.get(chat_id)
+        chat_caches[chat_id] = {
+            "cached_content": cached_content,
+            "model": model,
+            "system_prompt": system_prompt,
+            "last_message": prefix_messages[-1],
+            # Stop using the cache a little before Gemini expires it
+            "expires": time.monotonic() + config.CONTEXT_CACHE_TTL - 30,
+        }
+        logger.info(f"Created context cache {cached_content.name} for chat {chat_id} with {len(prefix_messages)} messages (~{estimated_tokens} tokens)")
+
+        if old_entry is not None:
+            old_entry["cached_content"].delete()
+    except Exception as e:
+        logger.error(f"Error creating context cache for chat {chat_id}: {e}")
+
+async def get_cached_model(
+    chat_id: int,
+    system_prompt: str,
+    prefix_messages: List[Dict[str, str]],
+    generation_config: Dict[str, Any]
+) -> Optional[Tuple[genai.GenerativeModel, List[Dict[str, str]]]]:
+    """
+    Get a model whose context already contains the system prompt and older messages
+
+    Caches are (re)built in the background, so this never waits on Gemini. A cache
+    that lags behind the conversation is still used; the messages it is missing are
+    returned so they can be sent with the request.
+
+    Args:
+        chat_id: The Telegram chat ID
+        system_prompt: The system prompt with Puro's personality
+        prefix_messages: The chat's older messages (see Memory.get_cacheable_prefix)
+        generation_config: Generation settings for the cached model
+
+    Returns:
+        Tuple of (model, uncovered prefix messages), or None if no usable cache exists
+    """
+    if not config.CONTEXT_CACHE_ENABLED or not prefix_messages:
+        return None
+
+    entry = chat_caches.get(chat_id)
+    uncovered = None
+    if entry is not None and entry["expires"] > time.monotonic() and entry["system_prompt"] == system_prompt:
+        uncovered = _find_uncovered(prefix_messages, entry["last_message"])
+
+    needs_rebuild = uncovered is None or len(uncovered) >= config.CONTEXT_CACHE_REBUILD_MESSAGES
+    if needs_rebuild and chat_id not in _building:
+        task = asyncio.create_task(
+            asyncio.to_thread(_build_cache, chat_id, system_prompt, list(prefix_messages), generation_config)
+        )
+        _building[chat_id] = task
+        task.add_done_callback(lambda _: _building.pop(chat_id, None))
+
+    if uncovered is None:
+        return None
+
+    return entry["model"], uncovered
@@ -5,16 +5,11 @@ from typing import List, Dict, Any, Optional
 import random
 
 import google.generativeai as genai
-from duckduckgo_search import DDGS
 
 import config
-from web_search import format_chat_history
+from web_search import fetch_duckduckgo_results, recent_chat_history
 
 # Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 # Initialize Gemini
@@ -44,7 +39,7 @@ async def generate_diverse_search_queries(user_query: str, chat_history: List[Di
         Ensure the queries cover different aspects, use different phrasings, and explore various related topics.
 
         Recent conversation:
-        {format_chat_history(chat_history[-5:] if len(chat_history) > 5 else chat_history)}
+        {recent_chat_history(chat_history)}
 
         User's latest query: {user_query}
         User's language: {language}
@@ -134,50 +129,15 @@ async def perform_single_search(search_query: str, region: str, results_per_quer
     Returns:
         List of search results
     """
-    query_retries = 0
-    result_list = []
-
-    # Try the search with retries
-    while query_retries <= max_retries:
-        try:
-            # Create DDGS instance
-            ddgs = DDGS()
-
-            # Perform the search with language-specific region
-            results = ddgs.text(
-                keywords=search_query,
-                region=region,  # Region based on language
-                safesearch="off",  # No safety filtering
-                max_results=results_per_query  # Number of results per query
-            )
-
-            # Convert generator to list
-            result_list = list(results)
-            logger.info(f"Search query '{search_query}' returned {len(result_list)} results")
-
-            # If we got results, break the retry loop
-            if result_list:
-                break
-            else:
-                logger.warning(f"Search query returned no results, will retry: '{search_query}'")
-                query_retries += 1
-
-        except Exception as e:
-            # Debug: Log detailed error information
-            logger.error(f"Error in search query (attempt {query_retries+1}): {e}")
-
-            # Increment retry counter
-            query_retries += 1
-
-            # If we've reached max retries, log and break
-            if query_retries > max_retries:
-                logger.error(f"Reached maximum retries ({max_retries}) for search query: '{search_query}'")
-                break
-
-            # Wait a moment before retrying
-            await asyncio.sleep(1)
-
-    return result_list
+    # Deep searches run many queries in parallel, so they are bounded by the retry
+    # count only rather than the regular search time budget
+    return await fetch_duckduckgo_results(
+        search_query,
+        region=region,
+        max_results=results_per_query,
+        max_retries=max_retries,
+        timeout=float("inf")
+    )
 
 async def deep_search_with_progress(
     query: str,
@@ -332,9 +292,6 @@ async def deep_search_with_progress(
     await asyncio.gather(*tasks)
     logger.info(f"All parallel search tasks completed, found {total_results_count} total results")
 
-    # Format the results
-    text = ""
-
     # Shuffle results to get a diverse mix
     random.shuffle(all_results)
 
@@ -342,12 +299,11 @@ async def deep_search_with_progress(
     all_results = all_results[:max_sites]
     all_citations = all_citations[:max_sites]
 
-    # Format the text with results
-    for i, result in enumerate(all_results):
-        # Add the result body
-        text += f"\n\n{result['body']}\n"
-        # Add the source URL and title without numbered references
-        text += f"Source: {result['title']} - {result['href']}"
+    # Format the text with results, each followed by its source URL and title without numbered references
+    text = "".join(
+        f"\n\n{result['body']}\nSource: {result['title']} - {result['href']}"
+        for result in all_results
+    )
 
     # Final progress update in the appropriate language
     total_time = time.time() - start_time
@@ -400,7 +356,7 @@ async def generate_response_with_deep_search(
 
     # Create a special deep search system prompt
     deep_search_system_prompt = f"""
-    You are Puro (普罗 Pǔluó), a sentient dark latex wolf-like creature from the game "Changed". You are responding to a deep search query about "{query}" where you've gathered extensive information from many websites.
+    You are Puro (普罗 Pǔluó), a sentient dark latex wolf-like creature from the game "Changed". You are responding to a deep search query where you've gathered extensive information from many websites.
 
     Current conversation language: {language}
 
@@ -417,17 +373,10 @@ async def generate_response_with_deep_search(
     10. Maintain your friendly, helpful personality while providing expert-level information
     11. If the search results contain content in multiple languages, focus primarily on the content in {language}
     12. If you need to translate information from English to {language}, do so accurately while maintaining the original meaning
-
-    Remember that you've searched {search_results['stats']['unique_urls']} unique websites using {search_results['stats']['queries_used']} different search queries about "{query}", so your answer should reflect this depth of research.
     """
 
-    # Format messages for Gemini but use our special deep search prompt
-    base_prompt = format_messages_for_gemini(chat_history, deep_search_system_prompt)
-
     # Format citations for reference
-    citations_info = ""
-    for citation in search_results['citations']:
-        citations_info += f"{citation['title']} - {citation['url']}\n"
+    citations_info = "".join(f"{citation['title']} - {citation['url']}\n" for citation in search_results['citations'])
 
     # Add time awareness context if available
     time_awareness_info = ""
@@ -440,8 +389,11 @@ async def generate_response_with_deep_search(
         IMPORTANT: You have access to this time information, but DO NOT mention the time or time-related information in your response UNLESS the user EXPLICITLY asks about the time or specifically requests time-related information. Never volunteer time information on your own.
         """
 
-    # Add search context with special instructions for deep search
+    # Add search context with special instructions for deep search. Everything that depends
+    # on the query goes here, after the history, so the prompt prefix stays the same.
     search_context = f"""
+    Remember that you've searched {search_results['stats']['unique_urls']} unique websites using {search_results['stats']['queries_used']} different search queries about "{query}", so your answer should reflect this depth of research.
+
     I've performed an extensive deep search of the web about "{query}" using {search_results['stats']['queries_used']} different search queries and found information from {search_results['stats']['unique_urls']} unique websites. Many of these search queries were specifically in {language} to ensure we get results in the user's preferred language. Here's what I found that might help answer the user's question:
 
     {search_results['text']}
@@ -473,8 +425,8 @@ async def generate_response_with_deep_search(
     19. DO NOT acknowledge how long it's been since the user's last message UNLESS the user specifically asks about it
     """
 
-    # Create the final prompt
-    final_prompt = base_prompt.replace("\n\nPuro:", f"\n\n{search_context}\n\nPuro:")
+    # Create the final prompt, using our special deep search prompt as the system prompt
+    final_prompt = format_messages_for_gemini(chat_history, deep_search_system_prompt, search_context)
 
     try:
         # Configure Gemini with settings optimized for longer, more detailed responses
@@ -1,18 +1,37 @@
-from langdetect import detect
+from typing import Optional
+from langdetect import DetectorFactory, detect, detect_langs
 import google.generativeai as genai
 import config
 import logging
 
 # Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 # Initialize Gemini
 genai.configure(api_key=config.GEMINI_API_KEY)
 
+# Make langdetect deterministic (it is randomized by default)
+DetectorFactory.seed = 0
+
+# Map language codes to full language names
+LANGUAGE_MAP = {
+    'en': 'English',
+    'es': 'Spanish',
+    'fr': 'French',
+    'de': 'German',
+    'it': 'Italian',
+    'pt': 'Portuguese',
+    'ru': 'Russian',
+    'ja': 'Japanese',
+    'ko': 'Korean',
+    'zh-cn': 'Chinese',
+    'zh-tw': 'Chinese',
+    'ar': 'Arabic',
+    'hi': 'Hindi',
+    'tr': 'Turkish',
+    # Add more languages as needed
+}
+
 def detect_language(text: str) -> str:
     """
     Detect the language of the input text
@@ -27,30 +46,37 @@ def detect_language(text: str) -> str:
         # Use langdetect for initial detection
         lang_code = detect(text)
 
-        # Map language codes to full language names
-        language_map = {
-            'en': 'English',
-            'es': 'Spanish',
-            'fr': 'French',
-            'de': 'German',
-            'it': 'Italian',
-            'pt': 'Portuguese',
-            'ru': 'Russian',
-            'ja': 'Japanese',
-            'ko': 'Korean',
-            'zh-cn': 'Chinese',
-            'zh-tw': 'Chinese',
-            'ar': 'Arabic',
-            'hi': 'Hindi',
-            'tr': 'Turkish',
-            # Add more languages as needed
-        }
-
-        return language_map.get(lang_code, 'English')
+        return LANGUAGE_MAP.get(lang_code, 'English')
     except:
         # Default to English if detection fails
         return 'English'
 
+def detect_language_fast(text: str) -> Optional[str]:
+    """
+    Detect the language locally, without a Gemini round-trip
+
+    Only returns a result when the text is long enough and langdetect is
+    confident about a language we know the name of.
+
+    Args:
+        text: The text to detect language from
+
+    Returns:
+        Full language name, or None if the detection is not reliable
+    """
+    if len(text.strip()) < config.FAST_LANGUAGE_DETECTION_MIN_CHARS:
+        return None
+
+    try:
+        best = detect_langs(text)[0]
+    except Exception:
+        return None
+
+    if best.prob < config.FAST_LANGUAGE_DETECTION_MIN_CONFIDENCE:
+        return None
+
+    return LANGUAGE_MAP.get(best.lang)
+
 def detect_language_with_gemini(text: str, is_search_query: bool = False) -> str:
     """
     Use Gemini to detect language more accurately
@@ -1,26 +1,62 @@
 import logging
 import asyncio
-import os
-from typing import Dict, List, Any, Optional
+import datetime
+import hashlib
+import re
+import time
+from typing import Dict, List, Any, Optional, Callable, Awaitable, AsyncIterator
+from urllib.parse import urlparse
 
 import google.generativeai as genai
-from telegram import Update, Bot
+from aiolimiter import AsyncLimiter
+from telegram import Update, Bot, Chat, Message
 from telegram.ext import Application, MessageHandler, filters, ContextTypes
-from telegram.constants import ChatAction
-
-# Telegram message length limit (4096 characters)
-MAX_MESSAGE_LENGTH = 4096
+from telegram.constants import ChatAction, ChatType
+from telegram.error import RetryAfter, TelegramError
 
 import config
 from memory import Memory
-from web_search import generate_search_queries, search_with_duckduckgo
+from web_search import gather_searches, generate_search_queries, predict_follow_up_queries, search_with_duckduckgo_async
 from personality import create_system_prompt, format_messages_for_gemini
-from language_detection import detect_language_with_gemini
-from media_analysis import analyze_image, analyze_video, download_media_from_message
+from language_detection import detect_language_fast, detect_language_with_gemini
+from media_analysis import MEDIA_MIME_TYPES, analyze_image, analyze_video, download_media_from_message
 # Deep search functionality is still available but not exposed as a command
 from time_awareness import get_time_awareness_context
+from context_cache import get_cached_model
 # Action translation no longer needed as we've removed physical action descriptions
 
+# Telegram message length limit (4096 characters by default)
+MAX_MESSAGE_LENGTH = config.TELEGRAM_MAX_MESSAGE_CHARS
+
+# Sentence boundaries (whitespace after ., ! or ?) and word boundaries for split_long_message
+_SENT_RE = re.compile(r"(?<=[.!?])\s+")
+_WORD_RE = re.compile(r"\s+")
+
+# Instructions for answering with search results, appended to the system prompt
+SEARCH_RESPONSE_GUIDELINES = f"""
+When web search results are provided at the end of the conversation, use them to provide an accurate and helpful response while maintaining your Puro personality. Remember to:
+1. Keep your language at A1 level if not speaking English
+2. Vary your response length naturally - sometimes brief, sometimes a bit longer, like a real person would speak
+3. Your speech should be dynamic and natural - not consistently short or long, but appropriate to the situation
+4. Use sentence fragments sometimes ("Not sure." "Maybe later." "Books are nice.")
+5. For simple questions, use brief responses. For topics you're interested in, be a bit more detailed
+6. Use short responses like "Yes." "No." "I don't know." "Maybe." when appropriate, but don't overuse them
+7. For topics you're excited about (books, learning), show more enthusiasm and detail
+8. Speak naturally like a character with free will, NEVER like an AI assistant
+9. {"ONLY provide links or sources if the user specifically asks for them or if it's directly relevant to the conversation" if config.SHOW_LINKS_ONLY_WHEN_RELEVANT else "If the user asks for links or sources, provide the relevant URLs from the search result sources"}
+10. {"ONLY mention where information came from by including the URL if the user specifically asks for sources or if it's directly relevant to the conversation" if config.SHOW_LINKS_ONLY_WHEN_RELEVANT else "When providing information from sources, mention where it came from by including the URL"}
+11. DO NOT use numbered references like [1], [2], [4], [32], etc. in your response - instead, include the actual URLs if needed
+12. DO NOT mention the current time or time-related information UNLESS the user EXPLICITLY asks about the time
+13. DO NOT acknowledge how long it's been since the user's last message UNLESS the user specifically asks about it
+"""
+
+# Numbered references like [4], [32], [49] that Gemini sometimes adds
+_NUMBERED_REF_RE = re.compile(r'\[\d+\]')
+
+# Message filters, built once: media Puro can analyze, and everything handle_message accepts
+MEDIA_FILTER = filters.PHOTO | filters.VIDEO | filters.Document.IMAGE | filters.Document.VIDEO
+SUPPORTED_FILTER = filters.TEXT | MEDIA_FILTER
+
 # Configure logging with more detailed format and DEBUG level for better debugging
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s',
@@ -45,6 +81,15 @@ genai.configure(api_key=config.GEMINI_API_KEY)
 # User language cache
 user_languages: Dict[int, str] = {}
 
+# Limit background prefetches so they never compete with live requests for long
+prefetch_semaphore = asyncio.Semaphore(config.PREFETCH_CONCURRENCY)
+
+# Keep references to background tasks so they aren't garbage collected mid-run
+background_tasks = set()
+
+# Gemini generations currently in flight, keyed by a hash of the prompt
+inflight_generations: Dict[str, asyncio.Task] = {}
+
 def split_long_message(text: str, max_length: int = MAX_MESSAGE_LENGTH - 100) -> List[str]:
     """
     Split a long message into chunks that respect Telegram's message length limit.
@@ -78,8 +123,8 @@ def split_long_message(text: str, max_length: int = MAX_MESSAGE_LENGTH - 100) ->
 
             # If the paragraph itself is too long, split it by sentences
             if len(paragraph) > max_length:
-                # Split by sentences (period followed by space or newline)
-                sentences = paragraph.replace(". ", ".\n").split("\n")
+                # Split by sentences (sentence punctuation followed by whitespace)
+                sentences = _SENT_RE.split(paragraph)
 
                 for sentence in sentences:
                     # If adding this sentence would exceed the limit, save the current chunk and start a new one
@@ -91,7 +136,7 @@ def split_long_message(text: str, max_length: int = MAX_MESSAGE_LENGTH - 100) ->
 
                         # If the sentence itself is too long, split it by words
                         if len(sentence) > max_length:
-                            words = sentence.split(" ")
+                            words = _WORD_RE.split(sentence)
 
                             for word in words:
                                 # If adding this word would exceed the limit, save the current chunk and start a new one
@@ -132,6 +177,235 @@ def split_long_message(text: str, max_length: int = MAX_MESSAGE_LENGTH - 100) ->
 
     return chunks
 
+async def prefetch_follow_up_searches(chat_id: int, user_message: str, response: str) -> None:
+    """
+    Warm the search cache for the user's likely next question
+
+    Args:
+        chat_id: The Telegram chat ID (for logging)
+        user_message: The user's latest message
+        response: The response that was just sent
+    """
+    # Skip instead of queueing up when enough prefetches are already running
+    if prefetch_semaphore.locked():
+        logger.debug(f"Skipping search prefetch for chat {chat_id}, prefetch slots are busy")
+        return
+
+    async with prefetch_semaphore:
+        try:
+            queries = await asyncio.to_thread(predict_follow_up_queries, user_message, response)
+            logger.info(f"Prefetching {len(queries)} follow-up searches for chat {chat_id}: {queries}")
+            for query in queries:
+                # Nobody is waiting on these, so don't spend Gemini calls when DuckDuckGo fails
+                await search_with_duckduckgo_async(query, gemini_fallback=False)
+        except Exception as e:
+            logger.error(f"Error prefetching follow-up searches for chat {chat_id}: {e}")
+
+def get_send_limiters(context: ContextTypes.DEFAULT_TYPE, chat: Chat) -> List[AsyncLimiter]:
+    """
+    Get the rate limiters that apply to messages sent to a chat
+
+    The limiters live in bot_data so every handler shares them: one global limiter
+    for Telegram's ~30 messages per second, plus one per group chat for the
+    ~20 messages per minute group limit.
+
+    Args:
+        context: The handler context
+        chat: The chat the messages are sent to
+
+    Returns:
+        List of limiters to acquire before sending
+    """
+    limiters = [context.bot_data.setdefault("send_limiter", AsyncLimiter(30, 1))]
+
+    if chat.type in (ChatType.GROUP, ChatType.SUPERGROUP):
+        group_limiters = context.bot_data.setdefault("group_send_limiters", {})
+        if chat.id not in group_limiters:
+            group_limiters[chat.id] = AsyncLimiter(20, 60)
+        limiters.append(group_limiters[chat.id])
+
+    return limiters
+
+async def send_rate_limited(send: Callable[[], Awaitable[Any]], limiters: List[AsyncLimiter]) -> Any:
+    """
+    Call a Telegram send function within the rate limits, retrying after flood control
+
+    A send that hits flood control is retried before this returns, so messages sent
+    one after another keep their order even when one of them has to wait.
+
+    Args:
+        send: Function performing the send
+        limiters: Rate limiters to acquire before each attempt
+
+    Returns:
+        Result of the send function
+    """
+    while True:
+        for limiter in limiters:
+            await limiter.acquire()
+        try:
+            return await send()
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if isinstance(retry_after, datetime.timedelta):
+                retry_after = retry_after.total_seconds()
+            logger.warning(f"Hit Telegram flood control, retrying in {retry_after}s")
+            await asyncio.sleep(retry_after)
+
+async def send_response_chunks(message: Message, context: ContextTypes.DEFAULT_TYPE, chunks: List[str]) -> None:
+    """
+    Send a response that was split into chunks
+
+    The first chunk is sent as a reply to the user's message. The chunks are sent
+    one after another, since Telegram doesn't keep concurrent sends in order.
+
+    Args:
+        message: The message being answered
+        context: The handler context
+        chunks: The response chunks, in order
+    """
+    chat_id = message.chat_id
+    limiters = get_send_limiters(context, message.chat)
+
+    await send_rate_limited(lambda: message.reply_text(chunks[0]), limiters)
+
+    for chunk in chunks[1:]:
+        await send_rate_limited(lambda: context.bot.send_message(chat_id=chat_id, text=chunk), limiters)
+
+class StreamingReply:
+    """
+    Show a response while it is being generated by editing the sent message
+
+    Edits are throttled to one per STREAM_EDIT_CHARS new characters or
+    STREAM_EDIT_INTERVAL seconds. When the text outgrows a Telegram message,
+    the current message is finished and a new one is started.
+    """
+
+    def __init__(self, message: Message, context: ContextTypes.DEFAULT_TYPE):
+        self.message = message
+        self.context = context
+        self.limiters = get_send_limiters(context, message.chat)
+        # Messages sent so far and the text each one shows
+        self.messages: List[Message] = []
+        self.message_texts: List[str] = []
+        # Full response text that has been shown so far
+        self.shown = ""
+        self.last_update = 0.0
+
+    async def update(self, text: str) -> None:
+        """
+        Show the response text generated so far
+
+        Args:
+            text: The full response text so far
+        """
+        now = time.monotonic()
+        if self.messages and (
+            len(text) - len(self.shown) < config.STREAM_EDIT_CHARS
+            and now - self.last_update < config.STREAM_EDIT_INTERVAL
+        ):
+            return
+
+        await self._show_all(self._layout(text))
+
+        self.shown = text
+        self.last_update = now
+
+    async def finish(self, text: str) -> None:
+        """
+        Show the complete response
+
+        The final text may differ from what was streamed (e.g. a reference marker
+        that was cut off mid-stream and then removed), so the sent messages are
+        edited to match it rather than sending the response again.
+
+        Args:
+            text: The complete response text
+        """
+        pieces = self._layout(text)
+        await self._show_all(pieces)
+
+        # Remove messages the final text no longer needs
+        for message in self.messages[len(pieces):]:
+            try:
+                await send_rate_limited(message.delete, self.limiters)
+            except TelegramError as e:
+                logger.warning(f"Could not delete leftover streamed message: {e}")
+        del self.messages[len(pieces):]
+        del self.message_texts[len(pieces):]
+
+        self.shown = text
+
+    @staticmethod
+    def _layout(text: str) -> List[str]:
+        """Split text into the pieces shown by each message."""
+        pieces = []
+        offset = 0
+        while len(text) - offset > MAX_MESSAGE_LENGTH:
+            piece = text[offset:offset + MAX_MESSAGE_LENGTH]
+            cut = max(piece.rfind("\n"), piece.rfind(" "))
+            if cut <= 0:
+                cut = len(piece)
+            pieces.append(piece[:cut])
+            offset += cut
+            while offset < len(text) and text[offset].isspace():
+                offset += 1
+
+        piece = text[offset:]
+        if piece.strip():
+            pieces.append(piece)
+        return pieces
+
+    async def _show_all(self, pieces: List[str]) -> None:
+        """Make the messages show pieces, stopping at the first one that can't be sent."""
+        for index, piece in enumerate(pieces):
+            if not await self._show(index, piece):
+                break
+
+    async def _show(self, index: int, text: str) -> bool:
+        """
+        Send or edit a message so it shows text
+
+        Telegram errors are logged rather than raised, so a failed edit doesn't
+        cost the response; the next update tries again.
+
+        Args:
+            index: Position of the message within the response
+            text: The text the message should show
+
+        Returns:
+            True if the message exists and shows text
+        """
+        if index < len(self.messages):
+            # Telegram trims trailing whitespace, so such edits would not change anything
+            if text.rstrip() == self.message_texts[index].rstrip():
+                return True
+            message = self.messages[index]
+            try:
+                await send_rate_limited(lambda: message.edit_text(text), self.limiters)
+            except TelegramError as e:
+                logger.warning(f"Could not edit streamed message: {e}")
+                return True
+            self.message_texts[index] = text
+            return True
+
+        try:
+            if self.messages:
+                chat_id = self.message.chat_id
+                sent = await send_rate_limited(
+                    lambda: self.context.bot.send_message(chat_id=chat_id, text=text), self.limiters
+                )
+            else:
+                # The first message is a reply to the user's message
+                sent = await send_rate_limited(lambda: self.message.reply_text(text), self.limiters)
+        except TelegramError as e:
+            logger.warning(f"Could not send streamed message: {e}")
+            return False
+
+        self.messages.append(sent)
+        self.message_texts.append(text)
+        return True
+
 async def keep_typing(chat_id: int, bot: Bot, cancel_event: asyncio.Event) -> None:
     """Keep sending typing action until cancel_event is set."""
     while not cancel_event.is_set():
@@ -156,7 +430,9 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             detected_language = "English"
             try:
                 if message.text is not None and message.text.strip() != "":
-                    detected_language = await asyncio.to_thread(detect_language_with_gemini, message.text)
+                    detected_language = detect_language_fast(message.text)
+                    if detected_language is None:
+                        detected_language = await asyncio.to_thread(detect_language_with_gemini, message.text)
                     user_languages[chat_id] = detected_language
                 else:
                     # If first message has no text, just use English
@@ -189,20 +465,20 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 # Add user message to memory
                 memory.add_message(chat_id, "user", user_message)
 
-                # Detect language
-                detected_language = await asyncio.to_thread(detect_language_with_gemini, user_message)
+                # Detect language locally first, only asking Gemini when unsure
+                detected_language = detect_language_fast(user_message)
+                if detected_language is None:
+                    detected_language = await asyncio.to_thread(detect_language_with_gemini, user_message)
                 user_languages[chat_id] = detected_language
 
             elif message.photo or message.video or (message.document and
-                  message.document.mime_type and
-                  (message.document.mime_type.startswith("image/") or
-                   message.document.mime_type.startswith("video/"))):
+                  (message.document.mime_type or "").partition("/")[0] in MEDIA_MIME_TYPES):
                 # Media message (photo or video)
 
-                # Download the media file
-                file_path, media_type = await download_media_from_message(message)
+                # Download the media into memory
+                media_data, media_type, mime_type = await download_media_from_message(message)
 
-                if not file_path:
+                if not media_data:
                     await message.reply_text(f"I couldn't process this media file. Please try again with a different file.")
                     if not cancel_typing.is_set():
                         cancel_typing.set()
@@ -211,10 +487,10 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
                 # Analyze the media
                 if media_type == "photo":
-                    media_analysis = await analyze_image(file_path)
+                    media_analysis = await analyze_image(media_data, mime_type)
                     user_message = f"[Image: {media_analysis['description'][:100]}...]"
                 elif media_type == "video":
-                    media_analysis = await analyze_video(file_path)
+                    media_analysis = await analyze_video(media_data, mime_type)
                     user_message = f"[Video: {media_analysis['description'][:100]}...]"
                 else:
                     # Unsupported media type
@@ -270,22 +546,28 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
             # Perform searches concurrently and collect results
             logger.info(f"Starting {len(search_queries)} DuckDuckGo searches concurrently")
-            search_tasks = []
-            for i, query in enumerate(search_queries):
-                logger.debug(f"Creating search task {i+1}/{len(search_queries)} for query: '{query}'")
-                # We still use asyncio.to_thread because the underlying duckduckgo_search library might be blocking
-                search_tasks.append(asyncio.to_thread(search_with_duckduckgo, query))
-
-            # Run searches concurrently
-            search_results_list = await asyncio.gather(*search_tasks)
+            search_results = await gather_searches(search_queries)
 
             # Combine search results
-            logger.info(f"Combining results from {len(search_results_list)} concurrent searches")
-            # Flatten the list of results (since gather returns a list of results)
-            search_results = search_results_list # Assuming search_with_duckduckgo returns the dict directly
+            logger.info(f"Combining results from {len(search_results)} concurrent searches")
             combined_results = combine_search_results(search_results)
             logger.info(f"Combined search results: {len(combined_results['text'])} chars of text with {len(combined_results['citations'])} citations")
 
+            # Stream the response into the chat as it is generated, if enabled
+            streaming_reply = None
+            on_partial = None
+            if config.STREAM_RESPONSES:
+                streaming_reply = StreamingReply(message, context)
+
+                async def show_partial(text: str) -> None:
+                    # Stop typing indicator once the response starts showing
+                    if not cancel_typing.is_set():
+                        cancel_typing.set()
+                        await typing_task
+                    await streaming_reply.update(text)
+
+                on_partial = show_partial
+
             # Generate response with search context
             response = await generate_response_with_search(
                 user_message,
@@ -293,37 +575,33 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 combined_results,
                 detected_language,
                 media_analysis if media_type in ("photo", "video") else None,
-                time_context if config.TIME_AWARENESS_ENABLED else None
+                time_context if config.TIME_AWARENESS_ENABLED else None,
+                on_partial=on_partial,
+                chat_id=chat_id
             )
 
             # Stop typing indicator
-            cancel_typing.set()
-            await typing_task
-
-            # Split the response into chunks if it's too long
-            response_chunks = split_long_message(response)
-            logger.info(f"Sending response in {len(response_chunks)} chunks")
-
-            # Send each chunk as a separate message
-            first_chunk = True
-            for chunk in response_chunks:
-                if first_chunk:
-                    # Send the first chunk as a reply to the original message
-                    await message.reply_text(chunk)
-                    first_chunk = False
-                else:
-                    # Send subsequent chunks as regular messages
-                    await context.bot.send_message(chat_id=chat_id, text=chunk)
+            if not cancel_typing.is_set():
+                cancel_typing.set()
+                await typing_task
+
+            if streaming_reply is not None:
+                await streaming_reply.finish(response)
+            else:
+                # Split the response into chunks if it's too long
+                response_chunks = split_long_message(response)
+                logger.info(f"Sending response in {len(response_chunks)} chunks")
+
+                await send_response_chunks(message, context, response_chunks)
 
             # Add model response to memory (store the full response)
             memory.add_message(chat_id, "model", response)
 
-            # Clean up temporary files if needed
-            if media_type in ("photo", "video") and file_path and os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except Exception as e:
-                    logger.error(f"Error removing temporary file {file_path}: {e}")
+            # Search ahead for the likely follow-up question while the user reads the reply
+            if config.ENABLE_PREFETCH:
+                prefetch_task = asyncio.create_task(prefetch_follow_up_searches(chat_id, user_message, response))
+                background_tasks.add(prefetch_task)
+                prefetch_task.add_done_callback(background_tasks.discard)
 
         except Exception as e:
             # Stop typing indicator if it's running
@@ -356,8 +634,13 @@ def combine_search_results(search_results: List[Dict[str, Any]]) -> Dict[str, An
     """
     Combine multiple search results into a single context
 
+    Each result's text is cut to SEARCH_RESULT_MAX_CHARS and the combined text stops
+    growing once it reaches SEARCH_CONTEXT_MAX_CHARS, so the final prompt stays small.
+    Only citations still present in the kept text are returned, deduplicated by domain
+    to keep the sources diverse.
+
     Args:
-        search_results: List of search result dictionaries
+        search_results: List of search result dictionaries (most relevant first)
 
     Returns:
         Combined search results
@@ -365,15 +648,35 @@ def combine_search_results(search_results: List[Dict[str, Any]]) -> Dict[str, An
     # Debug: Log the number of search results to combine
     logger.debug(f"Combining {len(search_results)} search results")
 
-    combined_text = ""
+    text_parts = []
+    total_length = 0
     all_citations = []
+    seen_domains = set()
 
     for i, result in enumerate(search_results):
+        if total_length >= config.SEARCH_CONTEXT_MAX_CHARS:
+            logger.debug(f"Search context budget reached, skipping {len(search_results) - i} remaining results")
+            break
+
         # Debug: Log details about each result being combined
         logger.debug(f"Combining result {i+1}: {len(result['text'])} chars of text with {len(result['citations'])} citations")
 
-        combined_text += result["text"] + "\n\n"
-        all_citations.extend(result["citations"])
+        budget = min(config.SEARCH_RESULT_MAX_CHARS, config.SEARCH_CONTEXT_MAX_CHARS - total_length)
+        text = result["text"][:budget]
+        text_parts.append(text)
+        total_length += len(text)
+
+        for citation in result["citations"]:
+            # Only cite sources that survived the truncation
+            if citation["url"] not in text:
+                continue
+            domain = urlparse(citation["url"]).netloc
+            if domain in seen_domains:
+                continue
+            seen_domains.add(domain)
+            all_citations.append(citation)
+
+    combined_text = "\n\n---\n\n".join(text_parts)
 
     # Debug: Log the final combined result
     logger.debug(f"Combined result: {len(combined_text)} chars of text with {len(all_citations)} citations")
@@ -383,6 +686,73 @@ def combine_search_results(search_results: List[Dict[str, Any]]) -> Dict[str, An
         "citations": all_citations
     }
 
+async def generate_content_deduplicated(model: genai.GenerativeModel, prompt: str, context_key: str = "") -> str:
+    """
+    Generate text with Gemini, sharing one request between identical concurrent prompts
+
+    Args:
+        model: The configured Gemini model
+        prompt: The prompt to send
+        context_key: Identifies context the model adds to the prompt (e.g. a context cache),
+            requests are only shared when this matches too
+
+    Returns:
+        Generated text
+    """
+    key = hashlib.blake2b(f"{context_key}\n{prompt}".encode("utf-8"), digest_size=16).hexdigest()
+
+    task = inflight_generations.get(key)
+    if task is None:
+        task = asyncio.create_task(asyncio.to_thread(lambda: model.generate_content(prompt).text))
+        inflight_generations[key] = task
+        task.add_done_callback(lambda _: inflight_generations.pop(key, None))
+    else:
+        logger.info("Identical Gemini request already in flight, waiting for its result")
+
+    # Shield the shared task so one cancelled caller doesn't cancel it for the others
+    return await asyncio.shield(task)
+
+async def stream_content(model: genai.GenerativeModel, prompt: str) -> AsyncIterator[str]:
+    """
+    Stream generated text from Gemini without blocking the event loop
+
+    Args:
+        model: The configured Gemini model
+        prompt: The prompt to send
+
+    Yields:
+        Pieces of generated text as they arrive
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    def produce() -> None:
+        try:
+            for part in model.generate_content(prompt, stream=True):
+                try:
+                    text = part.text
+                except ValueError:
+                    # Parts without text (e.g. the final metadata chunk)
+                    continue
+                loop.call_soon_threadsafe(queue.put_nowait, text)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    producer = asyncio.create_task(asyncio.to_thread(produce))
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        await producer
+
 async def generate_response(
     _: str,  # user_message not used directly but kept for consistent interface
     chat_history: List[Dict[str, str]],
@@ -435,7 +805,9 @@ async def generate_response_with_search(
     search_results: Dict[str, Any],
     language: str,
     media_analysis: Optional[Dict[str, Any]] = None,
-    time_context: Optional[Dict[str, Any]] = None
+    time_context: Optional[Dict[str, Any]] = None,
+    on_partial: Optional[Callable[[str], Awaitable[None]]] = None,
+    chat_id: Optional[int] = None
 ) -> str:
     """
     Generate a response using Gemini with search results
@@ -447,6 +819,8 @@ async def generate_response_with_search(
         language: Detected language
         media_analysis: Optional media analysis results
         time_context: Optional time awareness context
+        on_partial: Optional callback to stream the response; called with the text generated so far
+        chat_id: Optional chat ID, enables the Gemini context cache for the chat's older messages
 
     Returns:
         Generated response
@@ -458,13 +832,33 @@ async def generate_response_with_search(
     if media_analysis:
         logger.debug(f"Media analysis available: {len(media_analysis['description'])} chars description")
 
-    # Create system prompt with personality
-    system_prompt = create_system_prompt(language)
+    # Create system prompt with personality. It only depends on the language and goes
+    # first, so requests share a long prefix that Gemini can cache implicitly.
+    system_prompt = create_system_prompt(language) + SEARCH_RESPONSE_GUIDELINES
     logger.debug(f"Created system prompt for language: {language}")
 
-    # Format messages for Gemini
-    base_prompt = format_messages_for_gemini(chat_history, system_prompt)
-    logger.debug(f"Formatted base prompt: {len(base_prompt)} chars")
+    generation_config = {
+        "temperature": config.GEMINI_TEMPERATURE,
+        "top_p": config.GEMINI_TOP_P,
+        "top_k": config.GEMINI_TOP_K,
+        "max_output_tokens": config.GEMINI_MAX_OUTPUT_TOKENS,
+    }
+
+    # Use a Gemini context cache holding the system prompt and older messages if there is one
+    cached = None
+    if chat_id is not None:
+        cached = await get_cached_model(chat_id, system_prompt, memory.get_cacheable_prefix(chat_id), generation_config)
+
+    # Pick the messages to send with the request
+    if cached is not None:
+        model, uncovered_messages = cached
+        logger.debug(f"Using context cache for chat {chat_id}, sending {len(uncovered_messages)} uncached older messages")
+        prompt_history = uncovered_messages + chat_history
+        # The system prompt is already part of the cached context
+        system_prompt = ""
+    else:
+        model = None
+        prompt_history = chat_history
 
     # Add additional context
     additional_context = ""
@@ -508,52 +902,37 @@ async def generate_response_with_search(
 
     Here are the sources I used:
     {citations_info}
-
-    Please use this information to provide an accurate and helpful response while maintaining your Puro personality. Remember to:
-    1. Keep your language at A1 level if not speaking English
-    2. Vary your response length naturally - sometimes brief, sometimes a bit longer, like a real person would speak
-    3. Your speech should be dynamic and natural - not consistently short or long, but appropriate to the situation
-    4. Use sentence fragments sometimes ("Not sure." "Maybe later." "Books are nice.")
-    5. For simple questions, use brief responses. For topics you're interested in, be a bit more detailed
-    6. Use short responses like "Yes." "No." "I don't know." "Maybe." when appropriate, but don't overuse them
-    7. For topics you're excited about (books, learning), show more enthusiasm and detail
-    8. Speak naturally like a character with free will, NEVER like an AI assistant
-    9. {"ONLY provide links or sources if the user specifically asks for them or if it's directly relevant to the conversation" if config.SHOW_LINKS_ONLY_WHEN_RELEVANT else "If the user asks for links or sources, provide the relevant URLs from the citations above"}
-    10. {"ONLY mention where information came from by including the URL if the user specifically asks for sources or if it's directly relevant to the conversation" if config.SHOW_LINKS_ONLY_WHEN_RELEVANT else "When providing information from sources, mention where it came from by including the URL"}
-    11. DO NOT use numbered references like [1], [2], [4], [32], etc. in your response - instead, include the actual URLs if needed
-    12. DO NOT mention the current time or time-related information UNLESS the user EXPLICITLY asks about the time
-    13. DO NOT acknowledge how long it's been since the user's last message UNLESS the user specifically asks about it
     """
     additional_context += search_context
 
-    # Create the final prompt by inserting the additional context before the final "Puro:" part
-    final_prompt = base_prompt.replace("\n\nPuro:", f"\n\n{additional_context}\n\nPuro:")
+    # Create the final prompt with the per-request context after the conversation history
+    final_prompt = format_messages_for_gemini(prompt_history, system_prompt, additional_context)
     logger.debug(f"Created final prompt with {len(final_prompt)} chars")
 
     try:
         # Configure Gemini
-        logger.debug(f"Configuring Gemini model: {config.GEMINI_MODEL}")
-        model = genai.GenerativeModel(
-            model_name=config.GEMINI_MODEL,
-            generation_config={
-                "temperature": config.GEMINI_TEMPERATURE,
-                "top_p": config.GEMINI_TOP_P,
-                "top_k": config.GEMINI_TOP_K,
-                "max_output_tokens": config.GEMINI_MAX_OUTPUT_TOKENS,
-            },
-            safety_settings=config.SAFETY_SETTINGS
-        )
+        if model is None:
+            logger.debug(f"Configuring Gemini model: {config.GEMINI_MODEL}")
+            model = genai.GenerativeModel(
+                model_name=config.GEMINI_MODEL,
+                generation_config=generation_config,
+                safety_settings=config.SAFETY_SETTINGS
+            )
 
         # Generate response
         logger.info("Sending request to Gemini for final response generation")
-        response = await asyncio.to_thread(
-            lambda: model.generate_content(final_prompt).text
-        )
+        if on_partial is None:
+            context_key = f"chat:{chat_id}" if cached is not None else ""
+            response = await generate_content_deduplicated(model, final_prompt, context_key)
+        else:
+            response = ""
+            async for text in stream_content(model, final_prompt):
+                response += text
+                await on_partial(_NUMBERED_REF_RE.sub('', response))
 
         # Post-process the response to remove any numbered references
-        import re
         # Remove patterns like [4], [32], [49], etc.
-        response = re.sub(r'\[\d+\]', '', response)
+        response = _NUMBERED_REF_RE.sub('', response)
 
         # Debug: Log the response length
         logger.info(f"Received response from Gemini: {len(response)} chars")
@@ -572,24 +951,33 @@ async def error_handler(_: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Log the error and send a message to the developer."""
     logger.error(f"Exception while handling an update: {context.error}")
 
+async def post_init(_: Application) -> None:
+    """Start background tasks once the event loop is running."""
+    memory.start_flusher()
+
+async def post_shutdown(_: Application) -> None:
+    """Write any memory that hasn't been saved yet."""
+    await memory.stop_flusher()
+
 def main() -> None:
     """Start the bot."""
     # Create the Application
-    application = Application.builder().token(config.TELEGRAM_BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(config.TELEGRAM_BOT_TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Command handlers can be added here if needed
 
     # Add message handler for text, photo, video, and document messages
-    application.add_handler(MessageHandler(
-        filters.TEXT | filters.PHOTO | filters.VIDEO |
-        filters.Document.IMAGE | filters.Document.VIDEO,
-        handle_message
-    ))
+    application.add_handler(MessageHandler(SUPPORTED_FILTER, handle_message))
 
     # Add a catch-all handler for other message types
     application.add_handler(MessageHandler(
-        ~(filters.TEXT | filters.PHOTO | filters.VIDEO |
-          filters.Document.IMAGE | filters.Document.VIDEO),
+        ~SUPPORTED_FILTER,
         lambda update, _: update.message.reply_text("I don't understand this type of message. I can only handle text, images, and videos.")
     ))
 
@@ -1,8 +1,11 @@
-import os
+import re
+import json
+import hashlib
+import asyncio
 import logging
 from typing import List, Dict, Any, Optional, Tuple
-from pathlib import Path
-import tempfile
+from collections import OrderedDict
+from io import BytesIO
 
 import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
@@ -10,62 +13,258 @@ from telegram import Update, Message
 
 import config
 
+try:
+    import av
+except ImportError:
+    av = None
+
+try:
+    import yake
+except ImportError:
+    yake = None
+
+try:
+    import imagehash
+    from PIL import Image
+except ImportError:
+    imagehash = None
+
 # Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 # Initialize Gemini
 genai.configure(api_key=config.GEMINI_API_KEY)
 
-async def analyze_image(image_path: str) -> Dict[str, Any]:
+# Recent analysis results, keyed by (media kind, content hash), in least to most
+# recently used order. Each entry holds the perceptual hash (if any) and the result.
+media_cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+
+# Top-level MIME types of documents handled as media
+MEDIA_MIME_TYPES = frozenset({"image", "video"})
+
+# Prompts are constants and always sent before the media, so requests share a prefix
+IMAGE_ANALYSIS_PROMPT = """
+Analyze this image and return JSON with two fields:
+- "description": a detailed description of the image. Include all important elements, objects, people, text, and context.
+- "search_queries": 3 effective search queries that would help find relevant information about the image. Make the queries specific, focused, and likely to return useful information.
+"""
+VIDEO_ANALYSIS_PROMPT = """
+This is a video, or keyframes taken from it in order. Analyze it and return JSON with two fields:
+- "description": a detailed description of what you can see in the video. Include all important elements, objects, people, text, and context.
+- "search_queries": 3 effective search queries that would help find relevant information about the video. Make the queries specific, focused, and likely to return useful information.
+"""
+
+# Structured output schema, so the description and search queries come from one call
+MEDIA_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "description": {"type": "string"},
+        "search_queries": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["description", "search_queries"],
+}
+
+# Images and videos use the same settings, so one model is created at import and shared
+ANALYSIS_MODEL = genai.GenerativeModel(
+    model_name=config.GEMINI_FLASH_LITE_MODEL,
+    generation_config={
+        "temperature": config.GEMINI_FLASH_LITE_TEMPERATURE,
+        "top_p": config.GEMINI_FLASH_LITE_TOP_P,
+        "top_k": config.GEMINI_FLASH_LITE_TOP_K,
+        "max_output_tokens": config.GEMINI_FLASH_LITE_MAX_OUTPUT_TOKENS,
+        "response_mime_type": "application/json",
+        "response_schema": MEDIA_ANALYSIS_SCHEMA,
+    },
+    safety_settings=config.SAFETY_SETTINGS
+)
+
+def _extract_keyframes(video_data: bytes) -> List[bytes]:
     """
-    Analyze an image using Gemini Vision capabilities
+    Extract evenly spaced keyframes from a video as JPEG images
+
+    Only keyframes are decoded, which is much cheaper than decoding every frame.
+    Frames are picked while decoding, so at most VIDEO_MAX_FRAMES are kept however
+    long the video is.
 
     Args:
-        image_path: Path to the image file
+        video_data: The video bytes
 
     Returns:
-        Dictionary containing analysis results
+        Up to VIDEO_MAX_FRAMES JPEG images, or an empty list if PyAV is not installed
+        or no frames could be extracted
     """
+    if av is None:
+        return []
+
     try:
-        # Configure Gemini model
-        model = genai.GenerativeModel(
-            model_name=config.GEMINI_FLASH_LITE_MODEL,
-            generation_config={
-                "temperature": config.GEMINI_FLASH_LITE_TEMPERATURE,
-                "top_p": config.GEMINI_FLASH_LITE_TOP_P,
-                "top_k": config.GEMINI_FLASH_LITE_TOP_K,
-                "max_output_tokens": config.GEMINI_FLASH_LITE_MAX_OUTPUT_TOKENS,
-            },
-            safety_settings=config.SAFETY_SETTINGS
-        )
+        with av.open(BytesIO(video_data)) as container:
+            stream = container.streams.video[0]
+            stream.codec_context.skip_frame = "NONKEY"
 
-        # Read the image file
-        with open(image_path, "rb") as image_file:
-            image_data = image_file.read()
+            # Spread the frames over the video when its length is known, otherwise
+            # the first keyframes are used
+            if stream.duration is not None and stream.time_base is not None:
+                duration = float(stream.duration * stream.time_base)
+            elif container.duration is not None:
+                duration = container.duration / av.time_base
+            else:
+                duration = 0.0
+            interval = duration / config.VIDEO_MAX_FRAMES
 
-        # Generate image description
-        prompt = "Describe this image in detail. Include all important elements, objects, people, text, and context."
-        response = model.generate_content([prompt, {"mime_type": "image/jpeg", "data": image_data}])
+            keyframes = []
+            start = None
+            for frame in container.decode(stream):
+                if frame.time is None:
+                    continue
+                if start is None:
+                    start = frame.time
+                # Skip keyframes until the next evenly spaced point in the video
+                if frame.time < start + len(keyframes) * interval:
+                    continue
 
-        # Generate search queries based on the image
-        search_prompt = """
-        Based on this image, generate 3 effective search queries that would help find relevant information.
-        Make the queries specific, focused, and likely to return useful information.
-        Return only the queries, one per line, without numbering or additional text.
-        """
-        search_response = model.generate_content([search_prompt, {"mime_type": "image/jpeg", "data": image_data}])
+                buffer = BytesIO()
+                frame.to_image().save(buffer, format="JPEG")
+                keyframes.append(buffer.getvalue())
+                if len(keyframes) >= config.VIDEO_MAX_FRAMES:
+                    break
+            return keyframes
+    except Exception as e:
+        logger.error(f"Error extracting keyframes from video: {e}")
+        return []
 
-        # Parse search queries
-        search_queries = [q.strip() for q in search_response.text.strip().split('\n') if q.strip()]
+def _hash_media(data: bytes) -> Tuple[str, Optional[Any]]:
+    """
+    Hash an image for the analysis cache
 
-        return {
-            "description": response.text,
-            "search_queries": search_queries[:3]  # Limit to 3 queries
-        }
+    Uses a perceptual hash when imagehash is installed, so re-encoded or resized
+    copies of the same image still match; otherwise falls back to SHA-256.
+
+    Args:
+        data: The image bytes
+
+    Returns:
+        Tuple of (cache key, perceptual hash or None)
+    """
+    if imagehash is not None:
+        try:
+            phash = imagehash.phash(Image.open(BytesIO(data)))
+            return f"phash:{phash}", phash
+        except Exception as e:
+            logger.debug(f"Could not compute perceptual hash, using SHA-256: {e}")
+    return f"sha256:{hashlib.sha256(data).hexdigest()}", None
+
+def _get_cached_analysis(kind: str, key: str, phash: Optional[Any]) -> Optional[Dict[str, Any]]:
+    """
+    Look up a cached analysis result
+
+    Args:
+        kind: "image" or "video"
+        key: Cache key from _hash_media
+        phash: Perceptual hash from _hash_media
+
+    Returns:
+        Copy of the cached result, or None on a miss
+    """
+    match = (kind, key) if (kind, key) in media_cache else None
+    if match is None and phash is not None:
+        # Near-duplicates have perceptual hashes a few bits apart
+        for cache_key, entry in media_cache.items():
+            if cache_key[0] == kind and entry["phash"] is not None and phash - entry["phash"] <= config.MEDIA_CACHE_MAX_DISTANCE:
+                match = cache_key
+                break
+    if match is None:
+        return None
+
+    media_cache.move_to_end(match)
+    result = media_cache[match]["result"]
+    logger.info(f"Reusing cached {kind} analysis for {match[1]}")
+    return {"description": result["description"], "search_queries": list(result["search_queries"])}
+
+def _cache_analysis(kind: str, key: str, phash: Optional[Any], result: Dict[str, Any]) -> None:
+    """
+    Store an analysis result, evicting the least recently used one when full
+
+    Args:
+        kind: "image" or "video"
+        key: Cache key from _hash_media
+        phash: Perceptual hash from _hash_media
+        result: The analysis result
+    """
+    media_cache[(kind, key)] = {"phash": phash, "result": result}
+    media_cache.move_to_end((kind, key))
+    while len(media_cache) > config.MEDIA_CACHE_SIZE:
+        media_cache.popitem(last=False)
+
+def _queries_from_description(description: str) -> List[str]:
+    """
+    Derive search queries from a media description without calling Gemini
+
+    Uses YAKE keyword extraction when installed, otherwise the description's first sentence.
+
+    Args:
+        description: The media description
+
+    Returns:
+        Up to 3 search queries
+    """
+    if yake is not None:
+        try:
+            extractor = yake.KeywordExtractor(n=3, top=3)
+            return [keyword for keyword, _ in extractor.extract_keywords(description)]
+        except Exception as e:
+            logger.debug(f"YAKE keyword extraction failed: {e}")
+
+    first_sentence = re.split(r"(?<=[.!?])\s+", description.strip(), maxsplit=1)[0]
+    return [first_sentence[:100]] if first_sentence else []
+
+def _parse_analysis(response_text: str) -> Dict[str, Any]:
+    """
+    Parse a structured media analysis response
+
+    Args:
+        response_text: JSON text returned by Gemini
+
+    Returns:
+        Dictionary with the description and up to 3 search queries
+    """
+    analysis = json.loads(response_text)
+    description = analysis.get("description", "")
+    search_queries = [q.strip() for q in analysis.get("search_queries", []) if q.strip()]
+    if not search_queries:
+        # Gemini returned no usable queries, so build them from the description
+        # instead of spending another vision call
+        search_queries = _queries_from_description(description)
+    return {
+        "description": description,
+        "search_queries": search_queries[:3]  # Limit to 3 queries
+    }
+
+async def analyze_image(image_data: bytes, mime_type: str = "image/jpeg") -> Dict[str, Any]:
+    """
+    Analyze an image using Gemini Vision capabilities
+
+    Args:
+        image_data: The image bytes
+        mime_type: MIME type of the image
+
+    Returns:
+        Dictionary containing analysis results
+    """
+    try:
+        # Re-sent or forwarded images reuse the earlier analysis
+        key, phash = await asyncio.to_thread(_hash_media, image_data)
+        cached = _get_cached_analysis("image", key, phash)
+        if cached is not None:
+            return cached
+
+        # Describe the image and generate search queries in one call
+        # The Gemini client blocks while uploading and waiting, so run it in a thread
+        response = await asyncio.to_thread(
+            ANALYSIS_MODEL.generate_content, [IMAGE_ANALYSIS_PROMPT, {"mime_type": mime_type, "data": image_data}]
+        )
+        result = _parse_analysis(response.text)
+        _cache_analysis("image", key, phash, result)
+        return result
     except Exception as e:
         logger.error(f"Error analyzing image: {e}")
         return {
@@ -73,55 +272,41 @@ async def analyze_image(image_path: str) -> Dict[str, Any]:
             "search_queries": ["image analysis error"]
         }
 
-async def analyze_video(video_path: str) -> Dict[str, Any]:
+async def analyze_video(video_data: bytes, mime_type: str = "video/mp4") -> Dict[str, Any]:
     """
     Analyze a video using Gemini Vision capabilities
 
     Args:
-        video_path: Path to the video file
+        video_data: The video bytes
+        mime_type: MIME type of the video
 
     Returns:
         Dictionary containing analysis results
     """
     try:
-        # Extract frames from the video (simplified approach - just analyze first frame)
-        # In a production environment, you would extract multiple frames and analyze them
-
-        # Configure Gemini model
-        model = genai.GenerativeModel(
-            model_name=config.GEMINI_FLASH_LITE_MODEL,
-            generation_config={
-                "temperature": config.GEMINI_FLASH_LITE_TEMPERATURE,
-                "top_p": config.GEMINI_FLASH_LITE_TOP_P,
-                "top_k": config.GEMINI_FLASH_LITE_TOP_K,
-                "max_output_tokens": config.GEMINI_FLASH_LITE_MAX_OUTPUT_TOKENS,
-            },
-            safety_settings=config.SAFETY_SETTINGS
-        )
-
-        # Read the video file (first frame only for simplicity)
-        with open(video_path, "rb") as video_file:
-            video_data = video_file.read()
-
-        # Generate video description
-        prompt = "This is a video. Describe what you can see in this video frame. Include all important elements, objects, people, text, and context."
-        response = model.generate_content([prompt, {"mime_type": "video/mp4", "data": video_data}])
-
-        # Generate search queries based on the video
-        search_prompt = """
-        Based on this video frame, generate 3 effective search queries that would help find relevant information.
-        Make the queries specific, focused, and likely to return useful information.
-        Return only the queries, one per line, without numbering or additional text.
-        """
-        search_response = model.generate_content([search_prompt, {"mime_type": "video/mp4", "data": video_data}])
+        # Re-sent or forwarded videos reuse the earlier analysis, checked before any
+        # decoding. Videos are matched exactly, since unrelated videos often open on
+        # the same black or title frame
+        digest = await asyncio.to_thread(lambda: hashlib.sha256(video_data).hexdigest())
+        key = f"sha256:{digest}"
+        cached = _get_cached_analysis("video", key, None)
+        if cached is not None:
+            return cached
 
-        # Parse search queries
-        search_queries = [q.strip() for q in search_response.text.strip().split('\n') if q.strip()]
+        # Send a few keyframes instead of the whole video when possible
+        # (decoding runs in a thread so it doesn't block the event loop)
+        keyframes = await asyncio.to_thread(_extract_keyframes, video_data)
+        if keyframes:
+            media_parts = [{"mime_type": "image/jpeg", "data": keyframe} for keyframe in keyframes]
+        else:
+            media_parts = [{"mime_type": mime_type, "data": video_data}]
 
-        return {
-            "description": response.text,
-            "search_queries": search_queries[:3]  # Limit to 3 queries
-        }
+        # Describe the video and generate search queries in one call
+        # The Gemini client blocks while uploading and waiting, so run it in a thread
+        response = await asyncio.to_thread(ANALYSIS_MODEL.generate_content, [VIDEO_ANALYSIS_PROMPT, *media_parts])
+        result = _parse_analysis(response.text)
+        _cache_analysis("video", key, None, result)
+        return result
     except Exception as e:
         logger.error(f"Error analyzing video: {e}")
         return {
@@ -129,48 +314,38 @@ async def analyze_video(video_path: str) -> Dict[str, Any]:
             "search_queries": ["video analysis error"]
         }
 
-async def download_media_from_message(message: Message) -> Tuple[Optional[str], str]:
+async def download_media_from_message(message: Message) -> Tuple[Optional[bytes], str, Optional[str]]:
     """
-    Download media (photo or video) from a Telegram message
+    Download media (photo or video) from a Telegram message into memory
 
     Args:
         message: Telegram message containing media
 
     Returns:
-        Tuple of (file_path, media_type)
+        Tuple of (file data, media_type, mime_type)
     """
     try:
-        # Create a temporary directory to store the file
-        temp_dir = tempfile.mkdtemp()
-
         if message.photo:
             # Get the largest photo (best quality)
             photo = message.photo[-1]
             file = await photo.get_file()
-            file_path = os.path.join(temp_dir, f"{file.file_id}.jpg")
-            await file.download_to_drive(file_path)
-            return file_path, "photo"
+            return bytes(await file.download_as_bytearray()), "photo", "image/jpeg"
 
         elif message.video:
             video = message.video
             file = await video.get_file()
-            file_path = os.path.join(temp_dir, f"{file.file_id}.mp4")
-            await file.download_to_drive(file_path)
-            return file_path, "video"
+            return bytes(await file.download_as_bytearray()), "video", video.mime_type or "video/mp4"
 
         elif message.document:
             # Check if document is an image or video
-            mime_type = message.document.mime_type
-            if mime_type and (mime_type.startswith("image/") or mime_type.startswith("video/")):
+            mime_type = message.document.mime_type or ""
+            major_type = mime_type.partition("/")[0]
+            if major_type in MEDIA_MIME_TYPES:
                 file = await message.document.get_file()
-                extension = mime_type.split("/")[1]
-                file_path = os.path.join(temp_dir, f"{file.file_id}.{extension}")
-                await file.download_to_drive(file_path)
-
-                media_type = "photo" if mime_type.startswith("image/") else "video"
-                return file_path, media_type
+                media_type = "photo" if major_type == "image" else "video"
+                return bytes(await file.download_as_bytearray()), media_type, mime_type
 
-        return None, "unknown"
+        return None, "unknown", None
     except Exception as e:
         logger.error(f"Error downloading media: {e}")
-        return None, "error"
+        return None, "error", None
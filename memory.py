@@ -1,16 +1,36 @@
 import os
-import json
+import asyncio
 import logging
-from typing import Dict, List
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+import orjson
 import config
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=4096)
+def _memory_path(memory_dir: str, chat_id: int) -> str:
+    """Build a chat's memory file path; cached since it's needed on every write."""
+    return os.path.join(memory_dir, f"memory_{chat_id}.jsonl")
+
 class Memory:
     def __init__(self):
-        # Dictionary to store conversations by chat_id
-        self.conversations: Dict[int, List[Dict[str, str]]] = {}
+        # Dictionary to store conversations by chat_id; the deques drop the oldest
+        # message by themselves once LONG_MEMORY_SIZE is reached
+        self.conversations: Dict[int, Deque[Dict[str, str]]] = {}
+
+        # Number of lines in each chat's memory file, used to decide when to compact it
+        self._line_counts: Dict[int, int] = {}
+
+        # Messages waiting to be written by the background flusher, by chat_id
+        self._pending: Dict[int, List[Dict[str, str]]] = {}
+        self._flush_event: Optional[asyncio.Event] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._flusher_task: Optional[asyncio.Task] = None
 
         # Create memory directory if it doesn't exist
         os.makedirs(config.MEMORY_DIR, exist_ok=True)
@@ -28,19 +48,108 @@ class Memory:
             content: The message content
         """
         if chat_id not in self.conversations:
-            self.conversations[chat_id] = []
+            self.conversations[chat_id] = deque(maxlen=config.LONG_MEMORY_SIZE)
 
-        self.conversations[chat_id].append({
+        message = {
             "role": role,
             "content": content
-        })
+        }
+        self.conversations[chat_id].append(message)
+        if self._flusher_task is None:
+            # No background flusher (e.g. in scripts and tests), write right away
+            write, args = self._plan_write(chat_id, [message])
+            try:
+                write(*args)
+            except Exception as e:
+                logger.error(f"Error saving memory for chat {chat_id}: {e}")
+        else:
+            # Let the background flusher write it together with other new messages
+            self._pending.setdefault(chat_id, []).append(message)
+            self._flush_event.set()
+
+    def start_flusher(self) -> None:
+        """
+        Start writing new messages to disk from a background task
+
+        Writes are batched every MEMORY_FLUSH_INTERVAL seconds and run in a worker
+        thread, so add_message never blocks the event loop on disk I/O.
+        Must be called from a running event loop.
+        """
+        if self._flusher_task is None:
+            self._flush_event = asyncio.Event()
+            self._stop_event = asyncio.Event()
+            self._flusher_task = asyncio.create_task(self._flusher())
 
-        # Trim the conversation if it exceeds the long memory size
-        if len(self.conversations[chat_id]) > config.LONG_MEMORY_SIZE:
-            self.conversations[chat_id] = self.conversations[chat_id][-config.LONG_MEMORY_SIZE:]
+    async def stop_flusher(self) -> None:
+        """
+        Stop the background flusher and write any pending messages
 
-        # Save the updated memory to disk
-        self._save_memory(chat_id)
+        The flusher is asked to stop rather than cancelled, so a write in progress
+        is never cut off halfway.
+        """
+        if self._flusher_task is not None:
+            self._stop_event.set()
+            self._flush_event.set()
+            await self._flusher_task
+            self._flusher_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Write all pending messages to disk
+
+        Chats that fail to be written keep their messages pending for the next flush.
+        """
+        for chat_id in list(self._pending):
+            messages = self._pending.pop(chat_id, None)
+            if not messages:
+                continue
+            # Taking the chat's pending messages and planning the write happen in one step,
+            # so a compaction snapshot never contains messages that are still pending
+            write, args = self._plan_write(chat_id, messages)
+            try:
+                await asyncio.to_thread(write, *args)
+            except Exception as e:
+                logger.error(f"Error saving memory for chat {chat_id}: {e}")
+                # Put them back in front of anything added during the write
+                self._pending[chat_id] = messages + self._pending.get(chat_id, [])
+                if self._flush_event is not None:
+                    self._flush_event.set()
+
+    async def _flusher(self) -> None:
+        """
+        Background task writing pending messages in batches
+        """
+        while not self._stop_event.is_set():
+            await self._flush_event.wait()
+            # Wait a bit so several messages are written together, unless we're stopping
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=config.MEMORY_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing memory: {e}")
+
+    def _plan_write(self, chat_id: int, messages: List[Dict[str, str]]) -> Tuple[Callable, tuple]:
+        """
+        Decide how to persist new messages: append them, or compact the file if it got too long
+
+        The conversation snapshot for compaction is taken here, on the caller's thread,
+        so the actual write can safely run in a worker thread.
+
+        Args:
+            chat_id: The Telegram chat ID
+            messages: The new messages
+
+        Returns:
+            Tuple of (write function, arguments)
+        """
+        if self._line_counts.get(chat_id, 0) + len(messages) > 2 * config.LONG_MEMORY_SIZE:
+            return self._compact, (chat_id, list(self.conversations[chat_id]))
+        return self._append_messages, (chat_id, messages)
 
     def get_short_memory(self, chat_id: int) -> List[Dict[str, str]]:
         """
@@ -55,7 +164,8 @@ class Memory:
         if chat_id not in self.conversations:
             return []
 
-        return self.conversations[chat_id][-config.SHORT_MEMORY_SIZE:]
+        conversation = self.conversations[chat_id]
+        return list(islice(conversation, max(0, len(conversation) - config.SHORT_MEMORY_SIZE), None))
 
     def get_long_memory(self, chat_id: int) -> List[Dict[str, str]]:
         """
@@ -70,69 +180,149 @@ class Memory:
         if chat_id not in self.conversations:
             return []
 
-        return self.conversations[chat_id]
+        return list(self.conversations[chat_id])
+
+    def get_cacheable_prefix(self, chat_id: int) -> List[Dict[str, str]]:
+        """
+        Get the older messages of a chat that come before the short-term memory
+
+        These rarely change between messages, so they can be cached on the Gemini side.
+
+        Args:
+            chat_id: The Telegram chat ID
+
+        Returns:
+            List of message dictionaries with 'role' and 'content' keys
+        """
+        if chat_id not in self.conversations:
+            return []
+
+        conversation = self.conversations[chat_id]
+        return list(islice(conversation, max(0, len(conversation) - config.SHORT_MEMORY_SIZE)))
 
     def _get_memory_file_path(self, chat_id: int) -> str:
         """
         Get the file path for a specific chat's memory file
 
+        Memory files are append-only JSON Lines logs, one message per line.
+
         Args:
             chat_id: The Telegram chat ID
 
         Returns:
             Path to the memory file
         """
+        return _memory_path(config.MEMORY_DIR, chat_id)
+
+    def _get_legacy_memory_file_path(self, chat_id: int) -> str:
+        """
+        Get the file path of a chat's memory in the old single-JSON-document format
+
+        Args:
+            chat_id: The Telegram chat ID
+
+        Returns:
+            Path to the legacy memory file
+        """
         return os.path.join(config.MEMORY_DIR, f"memory_{chat_id}.json")
 
-    def _save_memory(self, chat_id: int) -> None:
+    def _append_messages(self, chat_id: int, messages: List[Dict[str, str]]) -> None:
         """
-        Save a specific chat's memory to disk
+        Append messages to a chat's memory file
 
         Args:
             chat_id: The Telegram chat ID
+            messages: The messages to append
         """
-        try:
-            memory_file = self._get_memory_file_path(chat_id)
-            with open(memory_file, 'w', encoding='utf-8') as f:
-                json.dump(self.conversations[chat_id], f, ensure_ascii=False, indent=2)
-            logger.debug(f"Saved memory for chat {chat_id} to {memory_file}")
-        except Exception as e:
-            logger.error(f"Error saving memory for chat {chat_id}: {e}")
+        memory_file = self._get_memory_file_path(chat_id)
+        with open(memory_file, 'ab') as f:
+            f.write(b"".join(orjson.dumps(message, option=orjson.OPT_APPEND_NEWLINE) for message in messages))
+        self._line_counts[chat_id] = self._line_counts.get(chat_id, 0) + len(messages)
+        logger.debug(f"Appended {len(messages)} messages for chat {chat_id} to {memory_file}")
+
+    def _compact(self, chat_id: int, messages: List[Dict[str, str]]) -> None:
+        """
+        Rewrite a chat's memory file so it only holds the given messages
+
+        Args:
+            chat_id: The Telegram chat ID
+            messages: The chat's current messages
+        """
+        memory_file = self._get_memory_file_path(chat_id)
+        # Write to a temporary file and swap it in, so a crash mid-write keeps the old file
+        temp_file = f"{memory_file}.tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(b"".join(orjson.dumps(message, option=orjson.OPT_APPEND_NEWLINE) for message in messages))
+        os.replace(temp_file, memory_file)
+        self._line_counts[chat_id] = len(messages)
+        logger.debug(f"Compacted memory for chat {chat_id} in {memory_file}")
 
     def _load_memory(self, chat_id: int) -> None:
         """
         Load a specific chat's memory from disk
 
+        Memory files in the old single-JSON-document format are converted to JSON Lines.
+
         Args:
             chat_id: The Telegram chat ID
         """
         memory_file = self._get_memory_file_path(chat_id)
-        if os.path.exists(memory_file):
-            try:
-                with open(memory_file, 'r', encoding='utf-8') as f:
-                    self.conversations[chat_id] = json.load(f)
-                logger.info(f"Loaded memory for chat {chat_id} with {len(self.conversations[chat_id])} messages")
-            except Exception as e:
-                logger.error(f"Error loading memory for chat {chat_id}: {e}")
-                # Initialize empty conversation if loading fails
-                self.conversations[chat_id] = []
+        legacy_memory_file = self._get_legacy_memory_file_path(chat_id)
+        try:
+            if os.path.exists(memory_file):
+                messages = []
+                line_count = 0
+                with open(memory_file, 'rb') as f:
+                    for line in f:
+                        line_count += 1
+                        try:
+                            messages.append(orjson.loads(line))
+                        except orjson.JSONDecodeError:
+                            # Most likely a write that was cut off, skip it
+                            logger.warning(f"Skipping invalid line {line_count} in {memory_file}")
+                self.conversations[chat_id] = deque(messages, maxlen=config.LONG_MEMORY_SIZE)
+                self._line_counts[chat_id] = line_count
+            elif os.path.exists(legacy_memory_file):
+                with open(legacy_memory_file, 'rb') as f:
+                    self.conversations[chat_id] = deque(orjson.loads(f.read()), maxlen=config.LONG_MEMORY_SIZE)
+                self._compact(chat_id, self.conversations[chat_id])
+                os.remove(legacy_memory_file)
+                logger.info(f"Converted memory for chat {chat_id} from {legacy_memory_file} to {memory_file}")
+            else:
+                return
+            logger.info(f"Loaded memory for chat {chat_id} with {len(self.conversations[chat_id])} messages")
+        except Exception as e:
+            logger.error(f"Error loading memory for chat {chat_id}: {e}")
+            # Initialize empty conversation if loading fails
+            self.conversations[chat_id] = deque(maxlen=config.LONG_MEMORY_SIZE)
 
     def _load_all_memories(self) -> None:
         """
         Load all memories from disk
         """
         try:
-            # Get all memory files
-            memory_files = [f for f in os.listdir(config.MEMORY_DIR) if f.startswith("memory_") and f.endswith(".json")]
+            # Get all memory files (scandir avoids a separate stat call per entry)
+            with os.scandir(config.MEMORY_DIR) as entries:
+                memory_files = [
+                    entry.name for entry in entries
+                    if entry.name.startswith("memory_")
+                    and (entry.name.endswith(".jsonl") or entry.name.endswith(".json"))
+                    and entry.is_file()
+                ]
             logger.info(f"Found {len(memory_files)} memory files to load")
 
-            # Load each memory file
+            # Collect the chat IDs (a chat may have both a legacy and a new file)
+            chat_ids = set()
             for memory_file in memory_files:
                 try:
-                    # Extract chat_id from filename (memory_CHATID.json)
-                    chat_id = int(memory_file.split('_')[1].split('.')[0])
-                    self._load_memory(chat_id)
+                    # Extract chat_id from filename (memory_CHATID.jsonl)
+                    chat_ids.add(int(memory_file.split('_')[1].split('.')[0]))
                 except Exception as e:
                     logger.error(f"Error processing memory file {memory_file}: {e}")
+
+            # Load the chats in parallel; each load only touches its own chat's keys
+            if chat_ids:
+                with ThreadPoolExecutor(max_workers=min(16, len(chat_ids))) as executor:
+                    list(executor.map(self._load_memory, chat_ids))
         except Exception as e:
             logger.error(f"Error loading memories: {e}")
@@ -0,0 +1,170 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import google.generativeai as genai
+
+import config
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def embed_text(text: str) -> np.ndarray:
+    """
+    Embed a text with the Gemini embedding model
+
+    Args:
+        text: The text to embed
+
+    Returns:
+        Embedding vector
+    """
+    result = genai.embed_content(model=config.EMBEDDING_MODEL, content=text)
+    return np.asarray(result["embedding"], dtype=np.float32)
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for exact-match lookups
+
+    Args:
+        query: The query text
+
+    Returns:
+        Lowercased query with collapsed whitespace
+    """
+    return " ".join(query.lower().split())
+
+class SemanticCache:
+    """
+    Two-tier cache for query results
+
+    Lookups first try an exact match on the normalized query, then fall back to
+    the stored query with the most similar embedding (cosine similarity at or above
+    the threshold). Entries expire after ttl seconds and the least recently used
+    entry is evicted once max_size is reached. Safe to use from several threads.
+    """
+
+    def __init__(
+        self,
+        threshold: float = config.SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = config.SEARCH_CACHE_TTL,
+        max_size: int = config.SEARCH_CACHE_SIZE,
+        embed: Callable[[str], np.ndarray] = embed_text
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self.embed = embed
+
+        # Normalized query -> {"value", "ts"}, in least to most recently used order
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Unit-length embeddings of the stored queries, row i belongs to self._keys[i]
+        self._keys: List[str] = []
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        # Embeddings of recently looked up queries, so a miss followed by put() embeds once
+        self._recent_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query: str) -> Optional[Any]:
+        """
+        Look up a cached value for a query
+
+        Args:
+            query: The query text
+
+        Returns:
+            Cached value, or None on a miss
+        """
+        key = normalize_query(query)
+
+        with self._lock:
+            self._expire()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                logger.debug(f"Exact cache hit for query: '{query}'")
+                return self._entries[key]["value"]
+            if not self._keys:
+                return None
+
+        vector = self._get_embedding(key)
+        if vector is None:
+            return None
+
+        with self._lock:
+            if not self._keys:
+                return None
+            scores = self._vectors @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            match = self._keys[best]
+            self._entries.move_to_end(match)
+            logger.debug(f"Semantic cache hit for query: '{query}' matched '{match}' (score {scores[best]:.3f})")
+            return self._entries[match]["value"]
+
+    def put(self, query: str, value: Any) -> None:
+        """
+        Store a value for a query
+
+        Args:
+            query: The query text
+            value: The value to cache
+        """
+        key = normalize_query(query)
+        vector = self._get_embedding(key)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while len(self._entries) >= self.max_size:
+                self._remove(next(iter(self._entries)))
+
+            self._entries[key] = {"value": value, "ts": time.monotonic()}
+            if vector is not None:
+                self._keys.append(key)
+                if self._vectors.size:
+                    self._vectors = np.vstack([self._vectors, vector])
+                else:
+                    self._vectors = vector.reshape(1, -1)
+
+    def _get_embedding(self, key: str) -> Optional[np.ndarray]:
+        """Get the unit-length embedding for a normalized query, or None if embedding fails."""
+        with self._lock:
+            if key in self._recent_embeddings:
+                return self._recent_embeddings[key]
+
+        try:
+            vector = self.embed(key)
+        except Exception as e:
+            logger.error(f"Error embedding query '{key}' for semantic cache: {e}")
+            return None
+
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        vector = vector / norm
+
+        with self._lock:
+            self._recent_embeddings[key] = vector
+            while len(self._recent_embeddings) > self.max_size:
+                self._recent_embeddings.popitem(last=False)
+
+        return vector
+
+    def _expire(self) -> None:
+        """Drop expired entries. Must be called with the lock held."""
+        cutoff = time.monotonic() - self.ttl
+        # Entries are in LRU order, not insertion order, so check them all
+        for key in [k for k, entry in self._entries.items() if entry["ts"] < cutoff]:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        """Remove an entry and its embedding. Must be called with the lock held."""
+        del self._entries[key]
+        if key in self._keys:
+            index = self._keys.index(key)
+            del self._keys[index]
+            self._vectors = np.delete(self._vectors, index, axis=0)
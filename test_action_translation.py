@@ -1,11 +1,8 @@
 import logging
+import sys
 from action_translation import get_translated_action, translate_action
 
 # Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.DEBUG
-)
 logger = logging.getLogger(__name__)
 
 def test_action_translation():
@@ -24,20 +21,20 @@ def test_action_translation():
         "SITS_DOWN"
     ]
 
-    print("Testing action translation:")
-    print("==========================")
+    # Collect the output and write it once at the end
+    output = ["Testing action translation:", "=========================="]
 
     for language in languages:
-        print(f"\nLanguage: {language}")
-        print("-" * 20)
+        output.append(f"\nLanguage: {language}")
+        output.append("-" * 20)
 
         for action in actions:
             translated = get_translated_action(action, language)
-            print(f"{action}: {translated}")
+            output.append(f"{action}: {translated}")
 
     # Test direct translation
-    print("\nTesting direct translation:")
-    print("-" * 30)
+    output.append("\nTesting direct translation:")
+    output.append("-" * 30)
 
     test_phrases = [
         "*tilts head curiously*",
@@ -48,15 +45,20 @@ def test_action_translation():
 
     for language in languages:
         if language != "English":  # Skip English as it doesn't need translation
-            print(f"\nLanguage: {language}")
-            print("-" * 20)
+            output.append(f"\nLanguage: {language}")
+            output.append("-" * 20)
 
             for phrase in test_phrases:
                 translated = translate_action(phrase, language)
-                print(f"Original: {phrase}")
-                print(f"Translated: {translated}\n")
+                output.append(f"Original: {phrase}")
+                output.append(f"Translated: {translated}\n")
 
-    print("\nTest completed!")
+    output.append("\nTest completed!")
+    sys.stdout.write("\n".join(output) + "\n")
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.DEBUG
+    )
     test_action_translation()
@@ -1,18 +1,36 @@
+import asyncio
+import json
 import logging
 import os
+import tempfile
 from memory import Memory
 import config
 
 # Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.DEBUG
-)
 logger = logging.getLogger(__name__)
 
 def test_memory_persistence():
     """Test that memory is saved and loaded correctly"""
     
+    # Use a temporary memory directory so runs don't see each other's files
+    original_memory_dir = config.MEMORY_DIR
+    original_long_memory_size = config.LONG_MEMORY_SIZE
+    with tempfile.TemporaryDirectory() as memory_dir:
+        config.MEMORY_DIR = memory_dir
+        try:
+            _check_memory_persistence()
+            _check_legacy_conversion()
+            _check_background_flusher()
+            # A small memory size makes compaction happen after a few messages
+            config.LONG_MEMORY_SIZE = 5
+            _check_compaction()
+        finally:
+            config.MEMORY_DIR = original_memory_dir
+            config.LONG_MEMORY_SIZE = original_long_memory_size
+    
+    return True
+
+def _check_memory_persistence():
     # Create a test chat ID
     test_chat_id = 12345
     
@@ -25,10 +43,15 @@ def test_memory_persistence():
     memory.add_message(test_chat_id, "user", "Can you remember this conversation?")
     
     # Check if the memory file was created
-    memory_file = os.path.join(config.MEMORY_DIR, f"memory_{test_chat_id}.json")
+    memory_file = memory._get_memory_file_path(test_chat_id)
     logger.info(f"Checking if memory file exists: {memory_file}")
     assert os.path.exists(memory_file), f"Memory file {memory_file} was not created"
     
+    # Each message should be appended as its own JSON line
+    with open(memory_file, 'rb') as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 3, f"Expected 3 lines in {memory_file}, got {len(lines)}"
+    
     # Create a new memory instance to test loading
     new_memory = Memory()
     
@@ -42,8 +65,79 @@ def test_memory_persistence():
     assert loaded_messages[0]["content"] == "Hello, this is a test message", f"First message content doesn't match"
     
     logger.info("Memory persistence test passed!")
+
+def _read_lines(memory_file):
+    with open(memory_file, 'rb') as f:
+        return [json.loads(line) for line in f.read().splitlines()]
+
+def _check_compaction():
+    test_chat_id = 23456
+    memory = Memory()
     
-    return True
+    # The file is rewritten with only the remembered messages once it passes 2 * LONG_MEMORY_SIZE lines
+    for i in range(2 * config.LONG_MEMORY_SIZE):
+        memory.add_message(test_chat_id, "user", f"Message {i}")
+    memory_file = memory._get_memory_file_path(test_chat_id)
+    assert len(_read_lines(memory_file)) == 2 * config.LONG_MEMORY_SIZE, "Expected no compaction before the limit"
+    
+    memory.add_message(test_chat_id, "user", "One more message")
+    lines = _read_lines(memory_file)
+    expected = [f"Message {i}" for i in range(config.LONG_MEMORY_SIZE + 1, 2 * config.LONG_MEMORY_SIZE)] + ["One more message"]
+    assert [line["content"] for line in lines] == expected, f"Expected the compacted file to hold the last messages, got {lines}"
+    assert not os.path.exists(f"{memory_file}.tmp"), "Temporary compaction file was left behind"
+    
+    # Messages after the compaction are appended to it, and everything loads back
+    memory.add_message(test_chat_id, "model", "After compaction")
+    loaded_messages = [message["content"] for message in Memory().get_long_memory(test_chat_id)]
+    assert loaded_messages == expected[1:] + ["After compaction"], f"Unexpected messages after compaction: {loaded_messages}"
+    
+    logger.info("Memory compaction test passed!")
+
+def _check_legacy_conversion():
+    test_chat_id = 34567
+    legacy_messages = [
+        {"role": "user", "content": "Saved in the old format"},
+        {"role": "model", "content": "Still remembered"},
+    ]
+    legacy_file = os.path.join(config.MEMORY_DIR, f"memory_{test_chat_id}.json")
+    with open(legacy_file, 'w', encoding='utf-8') as f:
+        json.dump(legacy_messages, f)
+    
+    # Loading converts the old file to JSON Lines and removes it
+    memory = Memory()
+    assert memory.get_long_memory(test_chat_id) == legacy_messages, "Legacy messages were not loaded"
+    assert not os.path.exists(legacy_file), f"Legacy memory file {legacy_file} was not removed"
+    assert _read_lines(memory._get_memory_file_path(test_chat_id)) == legacy_messages, "Legacy messages were not converted"
+    
+    # The converted file is used from then on
+    memory.add_message(test_chat_id, "user", "New message")
+    loaded_messages = Memory().get_long_memory(test_chat_id)
+    assert loaded_messages == legacy_messages + [{"role": "user", "content": "New message"}], f"Unexpected messages after conversion: {loaded_messages}"
+    
+    logger.info("Legacy memory conversion test passed!")
+
+def _check_background_flusher():
+    test_chat_id = 45678
+    
+    async def add_messages_with_flusher():
+        memory = Memory()
+        memory.start_flusher()
+        for i in range(5):
+            memory.add_message(test_chat_id, "user", f"Queued message {i}")
+        # Stopping writes whatever the flusher hasn't written yet
+        await memory.stop_flusher()
+        assert memory._flusher_task is None, "Flusher task was not stopped"
+        return memory
+    
+    memory = asyncio.run(add_messages_with_flusher())
+    lines = _read_lines(memory._get_memory_file_path(test_chat_id))
+    assert [line["content"] for line in lines] == [f"Queued message {i}" for i in range(5)], f"Expected each queued message once, got {lines}"
+    
+    logger.info("Memory flusher test passed!")
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.DEBUG
+    )
     test_memory_persistence()
@@ -0,0 +1,71 @@
+import logging
+import numpy as np
+from response_cache import SemanticCache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Fixed embeddings for the test queries; "puro wolf" and "puro latex wolf" are near each other
+EMBEDDINGS = {
+    "puro wolf": [1.0, 0.0, 0.0],
+    "puro latex wolf": [0.99, 0.1, 0.0],
+    "changed game": [0.0, 1.0, 0.0],
+    "weather today": [0.0, 0.0, 1.0],
+}
+
+def fake_embed(text: str) -> np.ndarray:
+    """Look up a fixed embedding, failing for unknown texts like the real API might"""
+    if text not in EMBEDDINGS:
+        raise ValueError(f"No embedding for '{text}'")
+    return np.asarray(EMBEDDINGS[text], dtype=np.float32)
+
+def test_semantic_cache():
+    """Test exact and semantic hits, LRU eviction, expiry, and embedding failures"""
+
+    # Exact hits ignore case and extra whitespace
+    cache = SemanticCache(threshold=0.9, ttl=300, max_size=10, embed=fake_embed)
+    cache.put("Puro Wolf", "result 1")
+    assert cache.get("  puro   WOLF ") == "result 1", "Expected an exact hit for the normalized query"
+
+    # Similar queries hit, unrelated ones miss
+    assert cache.get("puro latex wolf") == "result 1", "Expected a semantic hit for a similar query"
+    assert cache.get("changed game") is None, "Expected a miss for an unrelated query"
+
+    # The least recently used entry is evicted, and its embedding goes with it
+    cache = SemanticCache(threshold=0.9, ttl=300, max_size=2, embed=fake_embed)
+    cache.put("puro wolf", "wolf")
+    cache.put("changed game", "game")
+    assert cache.get("puro wolf") == "wolf"
+    cache.put("weather today", "weather")
+    assert cache.get("changed game") is None, "Expected the least recently used entry to be evicted"
+    assert cache.get("puro wolf") == "wolf", "Expected the recently used entry to be kept"
+    assert cache.get("weather today") == "weather", "Expected the new entry to be stored"
+    assert len(cache._keys) == len(cache._vectors) == 2, "Expected one embedding per stored query"
+    for key, vector in zip(cache._keys, cache._vectors):
+        assert np.allclose(vector, fake_embed(key) / np.linalg.norm(fake_embed(key))), f"Embedding for '{key}' is misaligned"
+
+    # Expired entries are dropped, for exact and semantic lookups alike
+    cache = SemanticCache(threshold=0.9, ttl=60, max_size=10, embed=fake_embed)
+    cache.put("puro wolf", "old")
+    cache._entries["puro wolf"]["ts"] -= 120
+    assert cache.get("puro wolf") is None, "Expected an expired entry to miss"
+    assert cache.get("puro latex wolf") is None, "Expected an expired entry to miss semantically"
+    assert not cache._keys and not len(cache._vectors), "Expected the expired embedding to be removed"
+
+    # Queries that can't be embedded are still cached for exact lookups
+    cache = SemanticCache(threshold=0.9, ttl=300, max_size=10, embed=fake_embed)
+    cache.put("unknown query", "unknown")
+    assert cache.get("unknown query") == "unknown", "Expected an exact hit without an embedding"
+    assert cache.get("another unknown query") is None, "Expected a miss when the lookup can't be embedded"
+    assert not cache._keys, "Expected no embedding for a query that couldn't be embedded"
+
+    logger.info("Semantic cache test passed!")
+
+    return True
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.DEBUG
+    )
+    test_semantic_cache()
@@ -1,19 +1,35 @@
 import logging
 import datetime
+import time
 import pytz
+from cachetools import TTLCache
+from functools import lru_cache
 from typing import Dict, Any, Optional
 
 import config
 
 # Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
-# Cache for last message times by user
-user_last_message_times = {}
+# time.monotonic() of each user's last message, bounded so it doesn't grow with every new user
+user_last_message_times = TTLCache(
+    maxsize=config.LAST_MESSAGE_CACHE_SIZE,
+    ttl=config.LAST_MESSAGE_TTL_DAYS * 86400
+)
+
+_UTC = pytz.UTC
+_TURKEY_TZ = pytz.timezone("Europe/Istanbul")
+
+@lru_cache(maxsize=64)
+def _tz(name: str) -> datetime.tzinfo:
+    """Resolve a timezone name, caching the result since lookups are slow."""
+    return pytz.timezone(name)
+
+# Load the default timezone now, so the first message doesn't wait on reading zoneinfo from disk
+try:
+    _tz(config.DEFAULT_TIMEZONE)
+except pytz.UnknownTimeZoneError:
+    logger.error(f"Unknown default timezone {config.DEFAULT_TIMEZONE}, falling back to UTC")
 
 def get_current_time(timezone: str = None) -> datetime.datetime:
     """
@@ -29,12 +45,12 @@ def get_current_time(timezone: str = None) -> datetime.datetime:
         timezone = config.DEFAULT_TIMEZONE
         
     try:
-        tz = pytz.timezone(timezone)
+        tz = _tz(timezone)
         return datetime.datetime.now(tz)
     except Exception as e:
         logger.error(f"Error getting time for timezone {timezone}: {e}")
         # Fall back to UTC
-        return datetime.datetime.now(pytz.UTC)
+        return datetime.datetime.now(_UTC)
 
 def get_time_in_turkey() -> datetime.datetime:
     """
@@ -43,7 +59,10 @@ def get_time_in_turkey() -> datetime.datetime:
     Returns:
         Current datetime in Turkey timezone
     """
-    return get_current_time("Europe/Istanbul")
+    return datetime.datetime.now(_TURKEY_TZ)
+
+# Period of the day for each hour: morning 5-12, afternoon 12-17, evening 17-22, night otherwise
+_HOUR_PERIOD = ("night",) * 5 + ("morning",) * 7 + ("afternoon",) * 5 + ("evening",) * 5 + ("night",) * 2
 
 def get_time_period(dt: datetime.datetime) -> str:
     """
@@ -55,16 +74,7 @@ def get_time_period(dt: datetime.datetime) -> str:
     Returns:
         String representing the period of the day
     """
-    hour = dt.hour
-    
-    if 5 <= hour < 12:
-        return "morning"
-    elif 12 <= hour < 17:
-        return "afternoon"
-    elif 17 <= hour < 22:
-        return "evening"
-    else:
-        return "night"
+    return _HOUR_PERIOD[dt.hour]
 
 def format_time_for_prompt(dt: datetime.datetime) -> str:
     """
@@ -76,53 +86,51 @@ def format_time_for_prompt(dt: datetime.datetime) -> str:
     Returns:
         Formatted time string
     """
-    period = get_time_period(dt)
-    weekday = dt.strftime("%A")
-    date = dt.strftime("%Y-%m-%d")
-    time = dt.strftime("%H:%M")
-    
-    return f"{weekday}, {date} at {time} ({period})"
+    return f"{dt.strftime('%A, %Y-%m-%d at %H:%M')} ({get_time_period(dt)})"
 
-def update_user_last_message_time(user_id: int) -> None:
+def update_user_last_message_time(user_id: int, now: Optional[float] = None) -> None:
     """
     Update the last message time for a user.
     
     Args:
         user_id: The user's ID
+        now: The current time.monotonic(), if the caller already has it
     """
-    user_last_message_times[user_id] = datetime.datetime.now(pytz.UTC)
+    user_last_message_times[user_id] = now if now is not None else time.monotonic()
 
-def get_time_since_last_message(user_id: int) -> Optional[datetime.timedelta]:
+def get_time_since_last_message(user_id: int, now: Optional[float] = None) -> Optional[float]:
     """
     Get the time elapsed since the user's last message.
     
     Args:
         user_id: The user's ID
+        now: The current time.monotonic(), if the caller already has it
         
     Returns:
-        Timedelta representing elapsed time, or None if no previous message
+        Seconds elapsed, or None if no previous message
     """
-    if user_id not in user_last_message_times:
+    last_time = user_last_message_times.get(user_id)
+    if last_time is None:
         return None
         
-    now = datetime.datetime.now(pytz.UTC)
-    last_time = user_last_message_times[user_id]
+    if now is None:
+        now = time.monotonic()
     return now - last_time
 
-def format_time_since_last_message(delta: datetime.timedelta) -> str:
+def format_time_since_last_message(seconds: Optional[float]) -> str:
     """
-    Format a timedelta into a human-readable string.
+    Format elapsed seconds into a human-readable string.
     
     Args:
-        delta: The timedelta to format
+        seconds: The elapsed seconds to format
         
     Returns:
         Human-readable string
     """
-    if delta is None:
+    if seconds is None:
         return "first message"
         
-    total_seconds = int(delta.total_seconds())
+    total_seconds = int(seconds)
     
     if total_seconds < 60:
         return f"{total_seconds} seconds ago"
@@ -146,16 +154,19 @@ def get_time_awareness_context(user_id: int) -> Dict[str, Any]:
     Returns:
         Dictionary with time context
     """
-    turkey_time = get_time_in_turkey()
+    # Read the clocks once and derive everything from them; elapsed time only needs the
+    # monotonic clock, which also can't jump when the system time changes
+    turkey_time = datetime.datetime.now(_TURKEY_TZ)
+    now = time.monotonic()
     time_period = get_time_period(turkey_time)
     formatted_time = format_time_for_prompt(turkey_time)
     
     # Get time since last message
-    time_since_last = get_time_since_last_message(user_id)
+    time_since_last = get_time_since_last_message(user_id, now)
     formatted_time_since = format_time_since_last_message(time_since_last)
     
     # Update last message time
-    update_user_last_message_time(user_id)
+    update_user_last_message_time(user_id, now)
     
     return {
         "current_time": turkey_time,
@@ -1,20 +1,74 @@
+import re
 import google.generativeai as genai
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import config
+import asyncio
 import logging
+import random
+import threading
 import time
+from itertools import islice
+from cachetools import TTLCache
 from duckduckgo_search import DDGS
+from response_cache import SemanticCache, normalize_query
 
 # Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 # Initialize Gemini
 genai.configure(api_key=config.GEMINI_API_KEY)
 
+# Models are created once and shared, GenerativeModel keeps no per-request state
+QUERY_MODEL = genai.GenerativeModel(
+    model_name=config.GEMINI_FLASH_LITE_MODEL,
+    generation_config={
+        "temperature": 0.2,
+        "top_p": config.GEMINI_FLASH_LITE_TOP_P,
+        "top_k": config.GEMINI_FLASH_LITE_TOP_K,
+        "max_output_tokens": 256,
+    },
+    safety_settings=config.SAFETY_SETTINGS
+)
+FOLLOW_UP_MODEL = genai.GenerativeModel(
+    model_name=config.GEMINI_FLASH_LITE_MODEL,
+    generation_config={
+        "temperature": 0.2,
+        "top_p": config.GEMINI_FLASH_LITE_TOP_P,
+        "top_k": config.GEMINI_FLASH_LITE_TOP_K,
+        "max_output_tokens": 128,
+    },
+    safety_settings=config.SAFETY_SETTINGS
+)
+FALLBACK_SEARCH_MODEL = genai.GenerativeModel(
+    model_name=config.GEMINI_FLASH_LITE_MODEL,
+    generation_config={
+        "temperature": config.GEMINI_FLASH_LITE_TEMPERATURE,
+        "top_p": config.GEMINI_FLASH_LITE_TOP_P,
+        "top_k": config.GEMINI_FLASH_LITE_TOP_K,
+        "max_output_tokens": config.GEMINI_FLASH_LITE_MAX_OUTPUT_TOKENS,
+    },
+    safety_settings=config.SAFETY_SETTINGS
+)
+
+# Recent Gemini fallback answers by normalized query. TTLCache isn't thread-safe and
+# fallback searches run in worker threads, so access goes through the lock.
+gemini_search_cache = TTLCache(maxsize=config.SEARCH_CACHE_SIZE, ttl=config.SEARCH_CACHE_TTL)
+_gemini_search_lock = threading.Lock()
+
+# Citations in simulated Gemini search results ("[Source: website.com]") and
+# numbered references ("[4]") that are stripped from all search text
+_CITATION_RE = re.compile(r'\[Source: ([^\]]+)\]')
+_NUMBERED_REF_RE = re.compile(r'\[\d+\]')
+
+# Section headers in batched Gemini fallback searches ("### QUERY 2")
+_QUERY_SECTION_RE = re.compile(r"^\s*#+\s*QUERY\s+(\d+)\s*$", re.MULTILINE)
+
+# Limits the number of DuckDuckGo searches running at the same time across all chats
+search_semaphore = asyncio.Semaphore(config.SEARCH_CONCURRENCY)
+
+# Cache of recent search results by query (exact and semantically similar), shared by all search threads
+search_cache = SemanticCache()
+
 def generate_search_queries(user_query: str, chat_history: List[Dict[str, str]]) -> List[str]:
     """
     Generate search queries based on the user's query and chat history
@@ -29,7 +83,7 @@ def generate_search_queries(user_query: str, chat_history: List[Dict[str, str]])
     try:
         # Debug: Log the user query and chat history length
         logger.info(f"Generating search queries for user query: '{user_query}'")
-        logger.debug(f"Using {len(chat_history)} messages from chat history for context")
+        logger.debug("Using %s messages from chat history for context", len(chat_history))
 
         # Create a prompt to generate search queries
         prompt = f"""
@@ -38,7 +92,7 @@ def generate_search_queries(user_query: str, chat_history: List[Dict[str, str]])
         Make the queries specific, focused, and likely to return relevant information.
 
         Recent conversation:
-        {format_chat_history(chat_history[-5:] if len(chat_history) > 5 else chat_history)}
+        {recent_chat_history(chat_history)}
 
         User's latest query: {user_query}
 
@@ -46,27 +100,15 @@ def generate_search_queries(user_query: str, chat_history: List[Dict[str, str]])
         """
 
         # Debug: Log the prompt length
-        logger.debug(f"Generated prompt for search queries with {len(prompt)} characters")
-
-        # Generate search queries
-        model = genai.GenerativeModel(
-            model_name=config.GEMINI_FLASH_LITE_MODEL,
-            generation_config={
-                "temperature": 0.2,
-                "top_p": config.GEMINI_FLASH_LITE_TOP_P,
-                "top_k": config.GEMINI_FLASH_LITE_TOP_K,
-                "max_output_tokens": 256,
-            },
-            safety_settings=config.SAFETY_SETTINGS
-        )
+        logger.debug("Generated prompt for search queries with %s characters", len(prompt))
 
         # Debug: Log that we're sending the request to Gemini
-        logger.debug(f"Sending request to Gemini model {config.GEMINI_FLASH_LITE_MODEL} for search query generation")
+        logger.debug("Sending request to Gemini model %s for search query generation", config.GEMINI_FLASH_LITE_MODEL)
 
-        response = model.generate_content(prompt)
+        response = QUERY_MODEL.generate_content(prompt)
 
         # Debug: Log the raw response
-        logger.debug(f"Received raw response from Gemini: '{response.text}'")
+        logger.debug("Received raw response from Gemini: '%s'", response.text)
 
         # Parse the response into individual queries
         queries = [q.strip() for q in response.text.strip().split('\n') if q.strip()]
@@ -77,7 +119,7 @@ def generate_search_queries(user_query: str, chat_history: List[Dict[str, str]])
         # Limit to a maximum of 5 queries just in case
         result = queries[:5]
         if len(queries) > 5:
-             logger.debug(f"Limited from {len(queries)} to 5 search queries")
+             logger.debug("Limited from %s to 5 search queries", len(queries))
 
         return result
     except Exception as e:
@@ -87,36 +129,210 @@ def generate_search_queries(user_query: str, chat_history: List[Dict[str, str]])
         logger.info(f"Falling back to using original query: '{user_query}'")
         return [user_query]  # Fallback to using the original query
 
-def format_chat_history(chat_history: List[Dict[str, str]]) -> str:
+def predict_follow_up_queries(user_query: str, response: str) -> List[str]:
+    """
+    Guess search queries for the user's most likely next question
+
+    Args:
+        user_query: The user's latest message
+        response: Puro's answer to that message
+
+    Returns:
+        List of search queries (may be empty)
+    """
+    try:
+        prompt = f"""
+        A user asked: {user_query}
+
+        They got this answer: {response}
+
+        Predict the question the user is most likely to ask next and generate up to {config.PREFETCH_MAX_QUERIES} effective search queries that would help answer it.
+        Generate the search queries, one per line. Don't include any explanations or numbering.
+        """
+
+
+        logger.debug("Sending request to Gemini model %s for follow-up query prediction", config.GEMINI_FLASH_LITE_MODEL)
+        prediction = FOLLOW_UP_MODEL.generate_content(prompt)
+
+        queries = [q.strip() for q in prediction.text.strip().split('\n') if q.strip()]
+        logger.debug("Predicted %s follow-up search queries: %s", len(queries), queries)
+
+        return queries[:config.PREFETCH_MAX_QUERIES]
+    except Exception as e:
+        logger.error(f"Error predicting follow-up queries for '{user_query}': {e}")
+        return []
+
+def format_chat_history(chat_history: List[Dict[str, str]], max_chars: Optional[int] = None) -> str:
     """
     Format chat history for inclusion in prompts
 
     Args:
         chat_history: List of message dictionaries
+        max_chars: Cut each message to this many characters (default: no limit)
 
     Returns:
         Formatted chat history as a string
     """
-    formatted = []
-    for message in chat_history:
-        role = "User" if message["role"] == "user" else "Puro"
-        formatted.append(f"{role}: {message['content']}")
+    # A list (rather than a generator) lets join size the result up front
+    return "\n".join([
+        f"{'User' if message['role'] == 'user' else 'Puro'}: {message['content'][:max_chars]}"
+        for message in chat_history
+    ])
+
+def recent_chat_history(chat_history: List[Dict[str, str]], count: int = 5) -> str:
+    """
+    Format the last few user and Puro messages, trimmed for search query prompts
 
-    return "\n".join(formatted)
+    Args:
+        chat_history: List of message dictionaries
+        count: Number of recent messages to include
 
-def search_with_duckduckgo(query: str) -> Dict[str, Any]:
+    Returns:
+        Formatted chat history as a string
     """
-    Perform a search using DuckDuckGo with detailed debugging.
+    messages = [message for message in chat_history if message["role"] in ("user", "model")]
+    return format_chat_history(messages[-count:], config.SEARCH_HISTORY_MAX_CHARS)
+
+async def search_with_duckduckgo_async(query: str, gemini_fallback: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Perform a search using DuckDuckGo, reusing recent results for the same or a similar query.
 
     Args:
         query: The search query
+        gemini_fallback: Whether to ask Gemini when DuckDuckGo fails; gather_searches
+            passes False and answers all failed queries with search_with_gemini_batch
 
     Returns:
-        Dictionary containing search results
+        Dictionary containing search results, or None if DuckDuckGo failed and
+        gemini_fallback is False
+    """
+    # The cache may embed the query with Gemini, which blocks
+    cached = await asyncio.to_thread(search_cache.get, query)
+    if cached is not None:
+        logger.info(f"Using cached search results for query: '{query}'")
+        return cached
+
+    result = await _search_with_duckduckgo(query)
+    if result is None:
+        if not gemini_fallback:
+            return None
+        # If all attempts failed, fall back to Gemini search
+        logger.info(f"All DuckDuckGo search attempts failed, falling back to Gemini search for query: '{query}'")
+        result = await asyncio.to_thread(search_with_gemini, query)
+    if not result.get("failed"):
+        await asyncio.to_thread(search_cache.put, query, result)
+
+    return result
+
+async def gather_searches(queries: List[str]) -> List[Dict[str, Any]]:
+    """
+    Run DuckDuckGo searches concurrently with bounded fan-out and a wall-clock limit
+
+    Queries DuckDuckGo fails on are answered together by one batched Gemini search.
+
+    Args:
+        queries: The search queries to run
+
+    Returns:
+        Results of the searches that finished in time (may be fewer than queries)
+    """
+    if not queries:
+        return []
+
+    async def search_with_limit(query: str) -> Optional[Dict[str, Any]]:
+        async with search_semaphore:
+            return await search_with_duckduckgo_async(query, gemini_fallback=False)
+
+    tasks = []
+    for i, query in enumerate(queries):
+        logger.debug("Creating search task %s/%s for query: '%s'", i+1, len(queries), query)
+        tasks.append(asyncio.create_task(search_with_limit(query)))
+
+    done, pending = await asyncio.wait(tasks, timeout=config.SEARCH_TIMEOUT)
+
+    # Give up on searches that are still running, partial results are still useful
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.warning(f"{len(pending)}/{len(queries)} searches did not finish within {config.SEARCH_TIMEOUT}s")
+
+    # Keep the original query order for the finished searches
+    results = []
+    failed_queries = []
+    for query, task in zip(queries, tasks):
+        if task not in done:
+            continue
+        if task.exception() is not None:
+            logger.error(f"Search task failed: {task.exception()}")
+            continue
+        result = task.result()
+        if result is None:
+            failed_queries.append(query)
+        results.append(result)
+
+    # Answer all queries DuckDuckGo failed on with one Gemini request
+    if failed_queries:
+        logger.info(f"DuckDuckGo failed for {len(failed_queries)} queries, falling back to one batched Gemini search")
+        try:
+            fallback_results = iter(await asyncio.wait_for(
+                asyncio.to_thread(search_with_gemini_batch, failed_queries),
+                timeout=config.SEARCH_TIMEOUT
+            ))
+            results = [result if result is not None else next(fallback_results) for result in results]
+        except Exception as e:
+            logger.error(f"Batched Gemini fallback search failed: {e}")
+            results = [result for result in results if result is not None]
+
+    return results
+
+async def _backoff(retries: int, deadline: float) -> bool:
+    """
+    Wait before the next search attempt, with exponential backoff and jitter
+
+    Args:
+        retries: Number of failed attempts so far (at least 1)
+        deadline: time.monotonic() value after which retrying is pointless
+
+    Returns:
+        False without waiting if the next attempt couldn't start before the deadline
+    """
+    delay = min(0.25 * 2 ** (retries - 1) + random.random() * 0.1, 4.0)
+    if time.monotonic() + delay >= deadline:
+        logger.warning("Not retrying search, its time budget is spent")
+        return False
+    await asyncio.sleep(delay)
+    return True
+
+async def fetch_duckduckgo_results(
+    query: str,
+    region: str = "wt-wt",
+    max_results: Optional[int] = None,
+    max_retries: Optional[int] = None,
+    timeout: Optional[float] = None
+) -> List[Dict[str, str]]:
     """
-    # Track retries
+    Fetch raw DuckDuckGo results, retrying with backoff when a search fails or comes back empty
+
+    Args:
+        query: The search query
+        region: Region code for localized results (default: worldwide)
+        max_results: Number of results to request (default: config.MAX_SEARCH_RESULTS)
+        max_retries: Maximum number of retries (default: config.MAX_SEARCH_RETRIES)
+        timeout: Seconds after which no new attempt is started (default: config.SEARCH_TIMEOUT)
+
+    Returns:
+        List of results with 'title', 'href' and 'body' keys (empty if all attempts failed)
+    """
+    if max_results is None:
+        max_results = config.MAX_SEARCH_RESULTS
+    if max_retries is None:
+        max_retries = config.MAX_SEARCH_RETRIES
+    if timeout is None:
+        timeout = config.SEARCH_TIMEOUT
+
+    # Track retries, giving up once the time budget is spent
+    deadline = time.monotonic() + timeout
     retries = 0
-    max_retries = config.MAX_SEARCH_RETRIES
     result_list = []
 
     while retries <= max_retries:
@@ -129,24 +345,27 @@ def search_with_duckduckgo(query: str) -> Dict[str, Any]:
             logger.debug("DuckDuckGo search client initialized")
 
             # Debug: Log search parameters
-            logger.info(f"DuckDuckGo search parameters: region=wt-wt, safesearch=off, max_results={config.MAX_SEARCH_RESULTS}")
+            logger.info(f"DuckDuckGo search parameters: region={region}, safesearch=off, max_results={max_results}")
 
             # Perform the search with safety off
             try:
-                results = ddgs.text(
+                # The duckduckgo_search client is blocking, so run it in a thread
+                results = await asyncio.to_thread(
+                    ddgs.text,
                     keywords=query,
-                    region="wt-wt",  # Worldwide results
+                    region=region,
                     safesearch="off",  # No safety filtering
-                    max_results=config.MAX_SEARCH_RESULTS  # Number of results from config
+                    max_results=max_results
                 )
+                # Backends can return more than asked for, keep only the first max_results
+                result_list = list(islice(results, max_results))
 
                 # Debug: Log raw results count
-                result_list = list(results)  # Convert generator to list
                 logger.info(f"DuckDuckGo search returned {len(result_list)} results")
 
                 # Debug: Log first result if available
                 if result_list:
-                    logger.debug(f"First result title: '{result_list[0].get('title', 'No title')}'")
+                    logger.debug("First result title: '%s'", result_list[0].get('title', 'No title'))
                     # Search was successful, break the retry loop
                     break
                 else:
@@ -157,7 +376,8 @@ def search_with_duckduckgo(query: str) -> Dict[str, Any]:
                     if retries > max_retries:
                         logger.error(f"Reached maximum retries ({max_retries}) for query: '{query}'")
                         break
-                    time.sleep(2)  # Wait a bit longer between retries
+                    if not await _backoff(retries, deadline):
+                        break
 
             except Exception as search_error:
                 # Handle specific search errors
@@ -169,8 +389,9 @@ def search_with_duckduckgo(query: str) -> Dict[str, Any]:
                     logger.error(f"Reached maximum retries ({max_retries}) for query: '{query}'")
                     break
 
-                # Wait longer between retries for rate limit errors
-                time.sleep(3)
+                # Back off before retrying, rate limits are often short-lived
+                if not await _backoff(retries, deadline):
+                    break
 
         except Exception as e:
             # Debug: Log detailed error information
@@ -185,18 +406,40 @@ def search_with_duckduckgo(query: str) -> Dict[str, Any]:
                 break
 
             # Wait a moment before retrying
-            time.sleep(2)
+            if not await _backoff(retries, deadline):
+                break
+
+    return result_list
+
+async def _search_with_duckduckgo(query: str) -> Optional[Dict[str, Any]]:
+    """
+    Perform a search using DuckDuckGo with detailed debugging.
+
+    Args:
+        query: The search query
+
+    Returns:
+        Dictionary containing search results, or None if all attempts failed
+    """
+    result_list = await fetch_duckduckgo_results(query)
 
-    # Format the results
-    text = ""
+    # Format the results, stopping once there is more text than combine_search_results keeps
+    parts = []
     citations = []
+    length = 0
 
     for i, result in enumerate(result_list):
+        if length >= config.SEARCH_RESULT_MAX_CHARS:
+            logger.debug("Search result budget reached, skipping %s remaining results", len(result_list) - i)
+            break
+
         # Debug: Log each result being processed
-        logger.debug(f"Processing result {i+1}: '{result.get('title', 'No title')}'")
+        logger.debug("Processing result %s: '%s'", i+1, result.get('title', 'No title'))
 
-        # Add the result to the text
-        text += f"\n\n{result['body']}\n"
+        # Add the result and its source to the text without numbered references
+        part = f"\n\n{result['body']}\nSource: {result['title']} - {result['href']}"
+        parts.append(part)
+        length += len(part)
 
         # Add the citation
         citation = {
@@ -205,16 +448,13 @@ def search_with_duckduckgo(query: str) -> Dict[str, Any]:
         }
         citations.append(citation)
 
-        # Add source to the text without numbered references
-        text += f"Source: {result['title']} - {result['href']}"
+    text = "".join(parts)
 
     # Debug: Log formatted results summary
     logger.info(f"Formatted {len(citations)} DuckDuckGo results with {len(text)} characters of text")
 
-    # Post-process to remove any numbered references
-    import re
-    # Remove patterns like [4], [32], [49], etc.
-    processed_text = re.sub(r'\[\d+\]', '', text)
+    # Post-process to remove any numbered references like [4], [32], [49], etc.
+    processed_text = _NUMBERED_REF_RE.sub('', text)
 
     # If we got results, return them
     if result_list:
@@ -222,10 +462,45 @@ def search_with_duckduckgo(query: str) -> Dict[str, Any]:
             "text": processed_text.strip(),
             "citations": citations
         }
-    else:
-        # If all attempts failed, fall back to Gemini search
-        logger.info(f"All DuckDuckGo search attempts failed, falling back to Gemini search for query: '{query}'")
-        return search_with_gemini(query)
+    return None
+
+def _format_gemini_search_response(text: str) -> Dict[str, Any]:
+    """
+    Turn simulated search results from Gemini into text and citations
+
+    Args:
+        text: Gemini's response, with citations in the format [Source: website.com]
+
+    Returns:
+        Dictionary containing search results
+    """
+    citations = []
+
+    def replace_citation(match: re.Match) -> str:
+        # Record the citation and replace it in the text with the URL (without numbered references)
+        citation = {
+            "title": f"Source {len(citations) + 1}",
+            "url": f"https://{match.group(1).strip()}"
+        }
+        citations.append(citation)
+        return f"Source: {citation['title']} - {citation['url']}"
+
+    # Extract and replace citations in the format [Source: website.com] in a single pass
+    text = _CITATION_RE.sub(replace_citation, text)
+
+    # Debug: Log the number of citations found
+    logger.info(f"Found {len(citations)} citations in Gemini search response")
+
+    # Debug: Log the final formatted result
+    logger.info(f"Formatted Gemini search results with {len(text)} characters and {len(citations)} citations")
+
+    # Post-process to remove any numbered references like [4], [32], [49], etc.
+    processed_text = _NUMBERED_REF_RE.sub('', text)
+
+    return {
+        "text": processed_text,
+        "citations": citations
+    }
 
 def search_with_gemini(query: str) -> Dict[str, Any]:
     """
@@ -237,6 +512,13 @@ def search_with_gemini(query: str) -> Dict[str, Any]:
     Returns:
         Dictionary containing search results
     """
+    key = normalize_query(query)
+    with _gemini_search_lock:
+        cached = gemini_search_cache.get(key)
+    if cached is not None:
+        logger.info(f"Using cached Gemini search results for query: '{query}'")
+        return cached
+
     try:
         # Debug: Log that we're using Gemini as a fallback
         logger.info(f"Using Gemini as fallback search for query: '{query}'")
@@ -253,65 +535,21 @@ def search_with_gemini(query: str) -> Dict[str, Any]:
         """
 
         # Debug: Log the prompt length
-        logger.debug(f"Generated Gemini search prompt with {len(search_prompt)} characters")
-
-        # Use Gemini to generate a response that simulates web search results
-        model = genai.GenerativeModel(
-            model_name=config.GEMINI_FLASH_LITE_MODEL,
-            generation_config={
-                "temperature": config.GEMINI_FLASH_LITE_TEMPERATURE,
-                "top_p": config.GEMINI_FLASH_LITE_TOP_P,
-                "top_k": config.GEMINI_FLASH_LITE_TOP_K,
-                "max_output_tokens": config.GEMINI_FLASH_LITE_MAX_OUTPUT_TOKENS,
-            },
-            safety_settings=config.SAFETY_SETTINGS
-        )
+        logger.debug("Generated Gemini search prompt with %s characters", len(search_prompt))
 
         # Debug: Log that we're sending the request to Gemini
-        logger.debug(f"Sending request to Gemini model {config.GEMINI_FLASH_LITE_MODEL} for fallback search")
+        logger.debug("Sending request to Gemini model %s for fallback search", config.GEMINI_FLASH_LITE_MODEL)
 
-        response = model.generate_content(search_prompt)
+        # Use Gemini to generate a response that simulates web search results
+        response = FALLBACK_SEARCH_MODEL.generate_content(search_prompt)
 
         # Debug: Log that we received a response
-        logger.debug(f"Received Gemini search response with {len(response.text)} characters")
-
-        # Extract citations from the response text
-        text = response.text
-        citations = []
-
-        # Extract citations in the format [Source: website.com]
-        import re
-        citation_pattern = r'\[Source: ([^\]]+)\]'
-        matches = re.findall(citation_pattern, text)
-
-        # Debug: Log the number of citations found
-        logger.info(f"Found {len(matches)} citations in Gemini search response")
-
-        for i, match in enumerate(matches):
-            # Debug: Log each citation being processed
-            logger.debug(f"Processing citation {i+1}: '{match}'")
-
-            citation = {
-                "title": f"Source {i+1}",
-                "url": f"https://{match.strip()}"
-            }
-            citations.append(citation)
-
-            # Replace the citation in the text with the URL (without numbered references)
-            text = text.replace(f"[Source: {match}]", f"Source: {citation['title']} - {citation['url']}")
-
-        # Debug: Log the final formatted result
-        logger.info(f"Formatted Gemini search results with {len(text)} characters and {len(citations)} citations")
+        logger.debug("Received Gemini search response with %s characters", len(response.text))
 
-        # Post-process to remove any numbered references
-        import re
-        # Remove patterns like [4], [32], [49], etc.
-        processed_text = re.sub(r'\[\d+\]', '', text)
-
-        return {
-            "text": processed_text,
-            "citations": citations
-        }
+        result = _format_gemini_search_response(response.text)
+        with _gemini_search_lock:
+            gemini_search_cache[key] = result
+        return result
     except Exception as e:
         # Debug: Log the error with detailed information
         logger.error(f"Error performing Gemini fallback search for '{query}': {e}")
@@ -321,7 +559,72 @@ def search_with_gemini(query: str) -> Dict[str, Any]:
         fallback_message = f"I couldn't search for information about '{query}'. Let me try to answer based on what I know."
         logger.info(f"Using final fallback message: '{fallback_message}'")
 
+        # Marked so the fallback message never ends up in a cache
         return {
             "text": fallback_message,
-            "citations": []
+            "citations": [],
+            "failed": True
         }
+
+def search_with_gemini_batch(queries: List[str]) -> List[Dict[str, Any]]:
+    """
+    Perform Gemini fallback searches for several queries with a single request
+
+    Args:
+        queries: The search queries that DuckDuckGo couldn't answer
+
+    Returns:
+        Search results in the same order as queries
+    """
+    if len(queries) == 1:
+        result = search_with_gemini(queries[0])
+        if not result.get("failed"):
+            search_cache.put(queries[0], result)
+        return [result]
+
+    try:
+        logger.info(f"Using Gemini as fallback search for {len(queries)} queries: {queries}")
+
+        numbered_queries = "\n".join(f"{i+1}. {query}" for i, query in enumerate(queries))
+        search_prompt = f"""
+        I want you to act as a web search engine. I'll give you several queries, and you'll provide information about each as if you've searched the web.
+        For each piece of information, include a made-up but realistic website citation in the format [Source: website.com].
+
+        My search queries are:
+        {numbered_queries}
+
+        For each query, start a new section with a line containing only "### QUERY <number>", then provide comprehensive information about that topic with at least 3 different sources cited.
+        Format each section as a cohesive article with the citations inline.
+        """
+
+
+        logger.debug("Sending request to Gemini model %s for batched fallback search", config.GEMINI_FLASH_LITE_MODEL)
+        # Leave room for one answer per query
+        response = FALLBACK_SEARCH_MODEL.generate_content(
+            search_prompt,
+            generation_config={"max_output_tokens": config.GEMINI_FLASH_LITE_MAX_OUTPUT_TOKENS * len(queries)}
+        )
+
+        # Split the response into the numbered sections
+        sections = {}
+        parts = _QUERY_SECTION_RE.split(response.text)
+        for number, section in zip(parts[1::2], parts[2::2]):
+            sections[int(number) - 1] = section.strip()
+    except Exception as e:
+        logger.error(f"Error performing batched Gemini fallback search for {queries}: {e}")
+        sections = {}
+
+    results = []
+    for i, query in enumerate(queries):
+        if i in sections:
+            result = _format_gemini_search_response(sections[i])
+            with _gemini_search_lock:
+                gemini_search_cache[normalize_query(query)] = result
+        else:
+            logger.warning(f"No section for query '{query}' in batched Gemini search, searching it alone")
+            result = search_with_gemini(query)
+        if not result.get("failed"):
+            search_cache.put(query, result)
+        results.append(result)
+
+    return results